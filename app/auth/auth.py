@@ -9,35 +9,109 @@ The module uses Telegram IDs as the primary authentication mechanism, without re
 passwords, as authentication is delegated to the Telegram platform.
 """
 
-from datetime import datetime, timedelta
+from datetime import timedelta
 from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
+import base64
+import hmac
+import threading
+import time
+from cachetools import TTLCache
+import orjson
+import jwt
+from jwt.exceptions import PyJWTError
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.openapi.models import OAuth2 as OAuth2Model, OAuthFlows as OAuthFlowsModel
+from fastapi.security.base import SecurityBase
 from sqlalchemy.orm import Session
-import os
-from dotenv import load_dotenv
 
+from app.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_SECONDS
 from app.models.database import get_db
 from app.models.models import Member
 from app.models.schemas import TokenData
-
-# Load environment variables
-load_dotenv()
+from app.services.member_service import MemberService
 
 # Security configuration
-SECRET_KEY = os.getenv("SECRET_KEY")
 if not SECRET_KEY:
     raise ValueError("No SECRET_KEY set in environment variables. This is required for security.")
-ALGORITHM = os.getenv("ALGORITHM", "HS256")
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 
-# Password hashing configuration (not actively used since we authenticate via Telegram)
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Tokens are signed with a shared secret, so only HMAC algorithms are supported.
+# Digests are given by name so hmac.digest() can use OpenSSL's one-shot HMAC
+_HMAC_DIGESTS = {
+    "HS256": "sha256",
+    "HS384": "sha384",
+    "HS512": "sha512",
+}
+if ALGORITHM not in _HMAC_DIGESTS:
+    raise ValueError(f"Unsupported ALGORITHM '{ALGORITHM}'. Expected one of: {', '.join(_HMAC_DIGESTS)}")
+
+def _b64url_encode(data: bytes) -> bytes:
+    """
+    Encode bytes using unpadded base64url, as required by the JWT spec.
+    
+    Args:
+        data (bytes): Data to encode
+    
+    Returns:
+        bytes: The encoded data without '=' padding
+    """
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+# The secret and the JWT header never change for the lifetime of the process,
+# so they are encoded once instead of on every token issuance
+SECRET_KEY_BYTES = SECRET_KEY.encode("utf-8")
+_DIGEST = _HMAC_DIGESTS[ALGORITHM]
+_HEADER_B64 = _b64url_encode(orjson.dumps({"alg": ALGORITHM, "typ": "JWT"}))
+
+class FastBearer(SecurityBase):
+    """
+    Lightweight Bearer token scheme.
+    
+    Extracts the token from the Authorization header with a simple prefix check
+    instead of the generic parsing done by OAuth2PasswordBearer. It documents the
+    same OAuth2 password flow in the OpenAPI schema, so the interactive docs keep
+    working.
+    """
+    
+    def __init__(self, tokenUrl: str, scheme_name: Optional[str] = None):
+        """
+        Initialize the security scheme.
+        
+        Args:
+            tokenUrl (str): URL of the endpoint that issues tokens
+            scheme_name (Optional[str]): Name of the scheme in the OpenAPI schema
+        """
+        self.model = OAuth2Model(flows=OAuthFlowsModel(password={"tokenUrl": tokenUrl, "scopes": {}}))
+        self.scheme_name = scheme_name or self.__class__.__name__
+    
+    async def __call__(self, request: Request) -> str:
+        """
+        Get the Bearer token from the request.
+        
+        Args:
+            request (Request): The incoming request
+        
+        Returns:
+            str: The raw token
+        
+        Raises:
+            HTTPException: If the Authorization header is missing or is not a Bearer token
+        """
+        authorization = request.headers.get("authorization")
+        if authorization and authorization[:7].lower() == "bearer ":
+            return authorization[7:]
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
 
 # OAuth2 configuration
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+oauth2_scheme = FastBearer(tokenUrl="token")
+
+# Cache of already verified tokens (raw token -> (telegram_id, exp)) so that
+# each token is decoded only once during its lifetime
+_token_cache = TTLCache(maxsize=10_000, ttl=ACCESS_TOKEN_EXPIRE_SECONDS)
+_token_cache_lock = threading.Lock()
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """
@@ -51,13 +125,103 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         str: Encoded JWT token
     """
     to_encode = data.copy()
+    # The exp claim is an integer epoch, so compute it directly from time.time()
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expires_in = int(expires_delta.total_seconds())
     else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+        expires_in = ACCESS_TOKEN_EXPIRE_SECONDS
+    to_encode["exp"] = int(time.time()) + expires_in
+    
+    # Sign the token reusing the pre-encoded header
+    # orjson produces compact UTF-8 bytes directly
+    payload_b64 = _b64url_encode(orjson.dumps(to_encode))
+    signing_input = _HEADER_B64 + b"." + payload_b64
+    signature = hmac.digest(SECRET_KEY_BYTES, signing_input, _DIGEST)
+    encoded_jwt = signing_input + b"." + _b64url_encode(signature)
+    return encoded_jwt.decode("ascii")
+
+def _verify_token(token: str) -> dict:
+    """
+    Verify the signature and required claims of a JWT token.
+    
+    Tokens carrying the same header produced by create_access_token are verified
+    directly with hmac, comparing signatures in constant time. Any other header
+    is delegated to PyJWT's generic validation.
+    
+    Args:
+        token (str): Raw JWT token
+    
+    Returns:
+        dict: The verified token payload
+    
+    Raises:
+        PyJWTError: If the token is malformed, has an invalid signature, is expired
+                    or lacks the required claims
+    """
+    try:
+        signing_input, signature_b64 = token.encode("ascii").rsplit(b".", 1)
+        header_b64, payload_b64 = signing_input.split(b".", 1)
+    except (UnicodeEncodeError, ValueError):
+        raise jwt.DecodeError("Not enough segments")
+    
+    if header_b64 != _HEADER_B64:
+        return jwt.decode(
+            token,
+            SECRET_KEY,
+            algorithms=[ALGORITHM],
+            options={"require": ["exp", "sub"]}
+        )
+    
+    expected_signature = _b64url_encode(hmac.digest(SECRET_KEY_BYTES, signing_input, _DIGEST))
+    if not hmac.compare_digest(expected_signature, signature_b64):
+        raise jwt.InvalidSignatureError("Signature verification failed")
+    
+    try:
+        payload = orjson.loads(base64.urlsafe_b64decode(payload_b64 + b"=" * (-len(payload_b64) % 4)))
+    except ValueError:
+        raise jwt.DecodeError("Invalid payload string")
+    if not isinstance(payload, dict):
+        raise jwt.DecodeError("Invalid payload string: must be a json object")
+    
+    # Validate the required claims
+    for claim in ("exp", "sub"):
+        if payload.get(claim) is None:
+            raise jwt.MissingRequiredClaimError(claim)
+    if not isinstance(payload["exp"], int):
+        raise jwt.DecodeError("Expiration Time claim (exp) must be an integer.")
+    if payload["exp"] <= time.time():
+        raise jwt.ExpiredSignatureError("Signature has expired")
+    return payload
+
+def _decode_cached(token: str) -> str:
+    """
+    Decode a JWT token and return its subject, reusing previous verifications.
+    
+    The token is only decoded the first time it is seen. Subsequent calls return
+    the cached subject as long as the token has not reached its expiration time.
+    
+    Args:
+        token (str): Raw JWT token
+    
+    Returns:
+        str: The Telegram ID stored in the 'sub' claim
+    
+    Raises:
+        PyJWTError: If the token is invalid, expired or lacks the required claims
+    """
+    with _token_cache_lock:
+        cached = _token_cache.get(token)
+    if cached is not None:
+        telegram_id, exp = cached
+        if time.time() < exp:
+            return telegram_id
+    
+    payload = _verify_token(token)
+    telegram_id = payload["sub"]
+    
+    with _token_cache_lock:
+        _token_cache[token] = (telegram_id, payload["exp"])
+    return telegram_id
 
 async def get_current_member(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     """
@@ -82,19 +246,26 @@ async def get_current_member(token: str = Depends(oauth2_scheme), db: Session =
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        # Decode the JWT token
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        telegram_id: str = payload.get("sub")
-        if telegram_id is None:
-            raise credentials_exception
+        # Decode the JWT token (cached after the first successful verification)
+        telegram_id: str = _decode_cached(token)
         token_data = TokenData(username=telegram_id)
-    except JWTError:
+    except PyJWTError:
         raise credentials_exception
     
+    # Resolve the member through the cached ID (primary-key lookup) when possible
+    member = None
+    member_id = MemberService.get_cached_member_id(token_data.username)
+    if member_id is not None:
+        member = db.get(Member, member_id)
+        if member is not None and member.telegram_id != token_data.username:
+            member = None
+    
     # Find the member in the database
-    member = db.query(Member).filter(Member.telegram_id == token_data.username).first()
     if member is None:
-        raise credentials_exception
+        member = authenticate_member(token_data.username, db)
+        if member is None:
+            raise credentials_exception
+        MemberService.cache_member_id(member.telegram_id, member.id)
     return member
 
 async def get_current_active_member(current_member: Member = Depends(get_current_member)):
@@ -126,5 +297,11 @@ def authenticate_member(telegram_id: str, db: Session):
     Returns:
         Member: The authenticated member or None if not found
     """
-    member = db.query(Member).filter(Member.telegram_id == telegram_id).first()
+    # Telegram IDs recently found not to exist are rejected without querying the database
+    if MemberService.is_unknown_telegram_id(telegram_id):
+        return None
+    
+    member = MemberService.get_member_by_telegram_id(db, telegram_id)
+    if member is None:
+        MemberService.mark_unknown_telegram_id(telegram_id)
     return member 
\ No newline at end of file
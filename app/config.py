@@ -0,0 +1,54 @@
+"""
+Configuration Module
+
+This module loads the environment variables (including the .env file) once and
+exposes them as module-level constants. Every other module should import its
+configuration from here instead of calling load_dotenv() or os.getenv() itself.
+
+Required values (DATABASE_URL, SECRET_KEY) are validated by the modules that
+use them, so importing this module never fails.
+"""
+
+import os
+from dotenv import load_dotenv
+
+# Load environment variables from the .env file at the project root. Values
+# already set in the environment take precedence (override=False), and the
+# explicit path avoids find_dotenv()'s directory walk
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env"), override=False)
+
+# Database configuration
+# Limpiar la URL de posibles caracteres de nueva línea u otros caracteres no deseados
+DATABASE_URL = os.getenv("DATABASE_URL", "").strip()
+
+# Connection pool sizing (ignored for in-memory SQLite)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# Worker threads for sync endpoints and dependencies (AnyIO's default is 40).
+# Never fewer than the pool's connections, so every connection can be in use
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", str(max(40, DB_POOL_SIZE + DB_MAX_OVERFLOW))))
+
+# Security configuration
+SECRET_KEY = os.getenv("SECRET_KEY")
+ALGORITHM = os.getenv("ALGORITHM", "HS256")
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+ACCESS_TOKEN_EXPIRE_SECONDS = ACCESS_TOKEN_EXPIRE_MINUTES * 60
+
+# Application configuration
+DEBUG = os.getenv("DEBUG", "False").lower() in ("true", "1", "t")
+# Minimum level of the application's log records (e.g. WARNING in production)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").strip().upper()
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "8007"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+# Comma-separated list of origins allowed by CORS outside debug mode
+CORS_ORIGINS = [
+    origin.strip()
+    for origin in os.getenv(
+        "CORS_ORIGINS", "http://localhost,http://localhost:8000,http://localhost:3000"
+    ).split(",")
+    if origin.strip()
+]
@@ -2,7 +2,8 @@
 FinancialFamilyAPI - Main Application Module
 
 This module initializes the FastAPI application, configures middleware,
-registers routers, and sets up the database connection.
+and registers routers. Database tables are created once per deployment by
+app.scripts.init_db (or by Alembic migrations), not when the app is imported.
 
 The API provides endpoints for managing family finances, including:
 - Family and member management
@@ -11,32 +12,50 @@ The API provides endpoints for managing family finances, including:
 - Balance calculation
 """
 
+from contextlib import asynccontextmanager
+import anyio.to_thread
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse as JSONResponse
 from sqlalchemy.exc import SQLAlchemyError
-import os
 import logging
-import traceback
-from dotenv import load_dotenv
 
-from app.models.database import engine, Base
+from app.config import DEBUG, API_HOST, API_PORT, WEB_CONCURRENCY, CORS_ORIGINS, THREADPOOL_SIZE
 from app.routers import families, members, expenses, payments, auth, test_errors
 from app.middlewares.http_exception_handler import http_exception_handler, validation_exception_handler
-from app.utils.logging_config import get_logger
+from app.utils.logging_config import get_logger, loggable_headers
 
 # Configurar logging
 logger = get_logger("main")
 
-# Load environment variables from .env file
-load_dotenv()
+# Maximum number of request body bytes logged for unexpected errors
+MAX_LOGGED_BODY_BYTES = 2048
 
-# Determine if we're in debug mode
-DEBUG = os.getenv("DEBUG", "False").lower() in ("true", "1", "t")
+# Static body for database errors, built once at import time
+DATABASE_ERROR_CONTENT = {
+    "error": {
+        "message": "Database error occurred",
+        "type": "database_error",
+        "status_code": 500
+    }
+}
 
-# Create database tables if they don't exist
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Configure the worker process when the application starts.
+    
+    The endpoints and the get_db dependency are synchronous, so FastAPI runs
+    them in AnyIO's thread pool. Its size is set here so that it follows the
+    database pool instead of AnyIO's fixed default.
+    
+    Args:
+        app: The FastAPI application
+    """
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    logger.info(f"Thread pool size: {THREADPOOL_SIZE}")
+    yield
 
 # Initialize FastAPI application with metadata
 app = FastAPI(
@@ -45,7 +64,10 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
-    openapi_url="/openapi.json"
+    openapi_url="/openapi.json",
+    # Las respuestas que no se codifican en los routers se serializan con orjson
+    default_response_class=JSONResponse,
+    lifespan=lifespan
 )
 
 # Set debug mode
@@ -58,24 +80,19 @@ app.add_exception_handler(RequestValidationError, validation_exception_handler)
 
 @app.exception_handler(SQLAlchemyError)
 async def sqlalchemy_exception_handler(request, exc):
-    logger.error(f"Database error: {str(exc)}")
-    logger.error(f"Request path: {request.url.path}")
-    
-    return JSONResponse(
-        status_code=500,
-        content={
-            "error": {
-                "message": "Database error occurred",
-                "type": "database_error",
-                "status_code": 500
-            }
-        }
+    logger.error(
+        "Database error on %s: %s", request.url.path, exc,
+        extra={"path": request.url.path, "error_type": "database_error"}
     )
+    
+    return JSONResponse(status_code=500, content=DATABASE_ERROR_CONTENT)
 
 @app.exception_handler(ValueError)
 async def value_error_exception_handler(request, exc):
-    logger.warning(f"Value error: {str(exc)}")
-    logger.warning(f"Request path: {request.url.path}")
+    logger.warning(
+        "Value error on %s: %s", request.url.path, exc,
+        extra={"path": request.url.path, "error_type": "value_error"}
+    )
     
     return JSONResponse(
         status_code=400,
@@ -104,29 +121,46 @@ async def general_exception_handler(request, exc):
     Returns:
         JSONResponse: Una respuesta JSON con información sobre el error
     """
-    # Registrar información detallada del error
-    logger.error(f"Unexpected error: {str(exc)}")
-    logger.error(f"Request path: {request.url.path}")
-    logger.error(traceback.format_exc())
-    
-    # Registrar información de la solicitud para depuración
-    logger.error(f"Request method: {request.method}")
-    logger.error(f"Request headers: {request.headers}")
-    
-    # Registrar información adicional si está disponible
-    if hasattr(request, 'query_params'):
-        logger.error(f"Query params: {request.query_params}")
-    
-    if hasattr(request, 'path_params'):
-        logger.error(f"Path params: {request.path_params}")
+    # Registrar el error y el contexto de la solicitud en un único registro.
+    # El traceback completo recorre toda la pila, por lo que solo se adjunta en modo debug
+    error_type = type(exc).__name__
+    logger.error(
+        "Unexpected error %s on %s %s: %s | query=%s path_params=%s",
+        error_type,
+        request.method,
+        request.url.path,
+        exc,
+        request.query_params,
+        request.path_params,
+        exc_info=exc if app.debug else None,
+        extra={
+            "path": request.url.path,
+            "method": request.method,
+            "error_type": error_type,
+            "user_agent": request.headers.get("user-agent"),
+            "request_id": request.headers.get("x-request-id"),
+            "query": str(request.query_params),
+            "path_params": request.path_params
+        }
+    )
     
-    try:
-        # Intentar obtener el cuerpo de la solicitud si es posible
-        body = await request.body()
-        if body:
-            logger.error(f"Request body: {body.decode('utf-8', errors='replace')}")
-    except Exception as body_err:
-        logger.error(f"Could not read request body: {str(body_err)}")
+    # Las cabeceras y el cuerpo solo se registran en modo debug, ya que leerlos
+    # y formatearlos es costoso cuando se producen muchos errores
+    if app.debug:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Request headers: %s", loggable_headers(request.headers))
+        
+        try:
+            # Leer como máximo MAX_LOGGED_BODY_BYTES bytes del cuerpo de la solicitud
+            body = bytearray()
+            async for chunk in request.stream():
+                body.extend(chunk)
+                if len(body) >= MAX_LOGGED_BODY_BYTES:
+                    break
+            if body:
+                logger.error("Request body: %s", body[:MAX_LOGGED_BODY_BYTES].decode('utf-8', errors='replace'))
+        except Exception as body_err:
+            logger.error("Could not read request body: %s", body_err)
     
     # Devolver una respuesta JSON estructurada
     return JSONResponse(
@@ -142,18 +176,20 @@ async def general_exception_handler(request, exc):
     )
 
 # Configure Cross-Origin Resource Sharing (CORS)
-# This allows the API to be accessed from different domains/origins
-origins = [
-    "http://localhost",
-    "http://localhost:8000",
-    "http://localhost:3000",
-    "*"  # Allow all origins in development (restrict in production)
-]
+# This allows the API to be accessed from different domains/origins.
+# In debug mode any origin is allowed (without credentials, as required by the
+# CORS spec for the wildcard origin); in production only CORS_ORIGINS are allowed
+if DEBUG:
+    origins = ["*"]
+    allow_credentials = False
+else:
+    origins = CORS_ORIGINS
+    allow_credentials = True
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
-    allow_credentials=True,
+    allow_credentials=allow_credentials,
     allow_methods=["*"],  # Allow all HTTP methods
     allow_headers=["*"],  # Allow all headers
 )
@@ -167,7 +203,7 @@ app.include_router(payments.router)
 app.include_router(test_errors.router)
 
 @app.get("/")
-def read_root():
+async def read_root():
     """
     Root endpoint of the API.
     
@@ -181,10 +217,7 @@ def read_root():
 if __name__ == "__main__":
     import uvicorn
     
-    # Get host and port from environment variables or use defaults
-    host = os.getenv("API_HOST", "0.0.0.0")
-    port = int(os.getenv("API_PORT", "8007"))
-    
-    # Start the uvicorn server with hot-reload enabled for development
-    logger.info(f"Starting server on {host}:{port}")
-    uvicorn.run("main:app", host=host, port=port, reload=True) 
\ No newline at end of file
+    # Hot-reload only in debug mode; in production run WEB_CONCURRENCY workers instead
+    workers = 1 if DEBUG else WEB_CONCURRENCY
+    logger.info(f"Starting server on {API_HOST}:{API_PORT} (reload={DEBUG}, workers={workers})")
+    uvicorn.run("app.main:app", host=API_HOST, port=API_PORT, reload=DEBUG, workers=workers) 
\ No newline at end of file
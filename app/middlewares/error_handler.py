@@ -5,172 +5,202 @@ This module provides middleware for handling exceptions in the API.
 It catches exceptions and returns appropriate HTTP responses.
 """
 
-from starlette.middleware.base import BaseHTTPMiddleware
-from fastapi import Request, Response, status
-from fastapi.responses import JSONResponse
-from fastapi import FastAPI
+from fastapi import Request, status
 from sqlalchemy.exc import SQLAlchemyError
-from typing import Dict, Any, Union, Callable
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import logging
-import traceback
+import orjson
+from app.middlewares.http_exception_handler import encode_error_response
+from app.utils.logging_config import get_logger, loggable_headers
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+# Usar nuestro sistema de logging centralizado
+logger = get_logger("error_handler")
 
-# Clase alternativa para compatibilidad con Starlette
-class ErrorHandler:
-    """
-    Clase para compatibilidad con Starlette.
-    Esta clase es necesaria porque Starlette busca una clase llamada ErrorHandler.
-    """
-    def __init__(self, app=None):
-        self.app = app
+# Cuerpos de respuesta estáticos, serializados una sola vez al cargar el módulo
+_DATABASE_ERROR_BODY: bytes = orjson.dumps({
+    "error": {
+        "message": "Database error occurred",
+        "type": "database_error",
+        "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR
+    }
+})
+_UNEXPECTED_ERROR_BODY: bytes = orjson.dumps({
+    "error": {
+        "message": "An unexpected error occurred",
+        "type": "internal_server_error",
+        "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR
+    }
+})
 
-    async def __call__(self, scope, receive, send):
-        await self.app(scope, receive, send)
+# Atributos de las excepciones que no se registran como atributos personalizados
+_SKIP_ERR_ATTRS = frozenset({"message", "args"})
 
-class ErrorHandlerMiddleware(BaseHTTPMiddleware):
+# Longitud máxima registrada para cada atributo personalizado de un error
+MAX_ERROR_ATTR_REPR_LENGTH = 200
+
+class ErrorHandlerMiddleware:
     """
     Middleware for handling exceptions in the API.
     
     This middleware catches exceptions raised during request processing
     and returns appropriate HTTP responses with error details.
+    
+    Se implementa como middleware ASGI puro (en lugar de BaseHTTPMiddleware)
+    para evitar el task group y el stream de memoria que Starlette crea por
+    cada solicitud.
     """
     
-    def __init__(self, app: FastAPI) -> None:
+    __slots__ = ("app",)
+    
+    def __init__(self, app: ASGIApp) -> None:
         """
         Initialize the middleware.
         
         Args:
-            app: The FastAPI application
+            app: The next ASGI application
         """
-        super().__init__(app)
+        self.app = app
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         """
         Process the request and handle any exceptions.
         
         Args:
-            request: The incoming request
-            call_next: The next middleware or endpoint handler
-            
-        Returns:
-            Response: Either the normal response or an error response
+            scope: The ASGI connection scope
+            receive: The ASGI receive channel
+            send: The ASGI send channel
         """
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        response_started = False
+        
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+        
         try:
             # Intentar procesar la solicitud normalmente
-            response = await call_next(request)
-            return response
-        except SQLAlchemyError as e:
-            # Database errors
-            logger.error(f"Database error: {str(e)}")
-            logger.error(f"Request path: {request.url.path}")
-            
-            return JSONResponse(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                content=self._format_error_response(
-                    "Database error occurred",
-                    "database_error",
-                    status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
-            )
-        except ValueError as e:
-            # Value errors (validation, etc.)
-            logger.warning(f"Value error: {str(e)}")
-            logger.warning(f"Request path: {request.url.path}")
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            # Si la respuesta ya empezó a enviarse no se puede reemplazar
+            if response_started:
+                raise
             
-            return JSONResponse(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                content=self._format_error_response(
-                    str(e),
-                    "value_error",
-                    status.HTTP_400_BAD_REQUEST
+            request = Request(scope)
+            if isinstance(e, SQLAlchemyError):
+                # Database errors
+                logger.error(
+                    "Database error on %s: %s", request.url.path, e,
+                    extra={"path": request.url.path, "error_type": "database_error"}
                 )
-            )
-        except Exception as e:
-            # Unexpected errors (including custom exceptions)
-            try:
-                # Intentar registrar información detallada del error
-                error_message = str(e)
-                error_type = type(e).__name__
-                logger.error(f"Unexpected error: {error_message}")
-                logger.error(f"Error type: {error_type}")
-                logger.error(f"Request path: {request.url.path}")
-                
-                # Registrar el traceback completo si estamos en modo debug
-                # o si no es un error personalizado conocido
-                if not hasattr(e, 'is_handled') or not e.is_handled:
-                    logger.error(traceback.format_exc())
                 
-                # Registrar información de la solicitud para depuración
-                logger.error(f"Request method: {request.method}")
-                logger.error(f"Request headers: {request.headers}")
+                await self._send_json(
+                    send, status.HTTP_500_INTERNAL_SERVER_ERROR, _DATABASE_ERROR_BODY
+                )
+            elif isinstance(e, ValueError):
+                # Value errors (validation, etc.)
+                logger.warning(
+                    "Value error on %s: %s", request.url.path, e,
+                    extra={"path": request.url.path, "error_type": "value_error"}
+                )
                 
-                # Intentar registrar información adicional si está disponible
-                try:
-                    if hasattr(request, 'query_params'):
-                        logger.error(f"Query params: {request.query_params}")
-                    
-                    if hasattr(request, 'path_params'):
-                        logger.error(f"Path params: {request.path_params}")
-                        
-                    # Intentar registrar atributos adicionales del error personalizado
-                    if hasattr(e, '__dict__'):
-                        safe_attrs = {}
-                        for key, value in e.__dict__.items():
-                            if key not in ('message', 'args') and not key.startswith('_'):
-                                try:
-                                    # Intentar serializar el valor o proporcionar una descripción segura
-                                    if callable(value):
-                                        safe_attrs[key] = "<<función no serializable>>"
-                                    elif hasattr(value, '__dict__'):
-                                        safe_attrs[key] = f"<<objeto {type(value).__name__}>>"
-                                    else:
-                                        safe_attrs[key] = str(value)
-                                except Exception:
-                                    safe_attrs[key] = "<<valor no serializable>>"
-                        
-                        if safe_attrs:
-                            logger.error(f"Custom error attributes: {safe_attrs}")
-                except Exception as log_err:
-                    logger.error(f"Error logging request details: {str(log_err)}")
+                await self._send_json(
+                    send,
+                    status.HTTP_400_BAD_REQUEST,
+                    encode_error_response(
+                        str(e),
+                        "value_error",
+                        status.HTTP_400_BAD_REQUEST
+                    )
+                )
+            else:
+                # Unexpected errors (including custom exceptions)
+                self._log_unexpected_error(request, e)
                 
-            except Exception as log_err:
-                # Si hay un error al registrar el error, registrar esto también
-                logger.error(f"Error logging exception: {str(log_err)}")
-            
-            # Siempre retornar una respuesta JSON válida
-            return JSONResponse(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                content=self._format_error_response(
-                    "An unexpected error occurred",
-                    "internal_server_error",
-                    status.HTTP_500_INTERNAL_SERVER_ERROR
+                # Siempre retornar una respuesta JSON válida
+                await self._send_json(
+                    send, status.HTTP_500_INTERNAL_SERVER_ERROR, _UNEXPECTED_ERROR_BODY
                 )
-            )
     
-    def _format_error_response(
-        self, message: str, error_type: str, status_code: int
-    ) -> Dict[str, Any]:
+    @staticmethod
+    async def _send_json(send: Send, status_code: int, body: bytes) -> None:
         """
-        Format the error response.
+        Send a JSON response directly through the ASGI send channel.
         
         Args:
-            message: Error message
-            error_type: Type of error
+            send: The ASGI send channel
             status_code: HTTP status code
-            
-        Returns:
-            Dict: Formatted error response
+            body: Pre-encoded JSON body
+        """
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+    
+    @staticmethod
+    def _log_unexpected_error(request: Request, e: Exception) -> None:
+        """
+        Log the details of an unexpected error.
+        
+        Args:
+            request: The request that raised the error
+            e: The exception raised
         """
-        return {
-            "error": {
-                "message": message,
-                "type": error_type,
-                "status_code": status_code
+        # Solo construir el detalle del error si el nivel ERROR está habilitado
+        if not logger.isEnabledFor(logging.ERROR):
+            return
+        
+        try:
+            # Atributos adicionales del error personalizado; repr() da una
+            # descripción segura y acotada sin necesidad de inspeccionar su tipo
+            safe_attrs = {
+                key: repr(value)[:MAX_ERROR_ATTR_REPR_LENGTH]
+                for key, value in getattr(e, '__dict__', {}).items()
+                if key not in _SKIP_ERR_ATTRS and not key.startswith('_')
             }
-        } 
\ No newline at end of file
+            error_type = type(e).__name__
+            
+            # Un único registro con todo el contexto: un solo formateo y una
+            # sola escritura. El traceback solo se adjunta (y se formatea de
+            # forma diferida por el handler) si no es un error personalizado conocido
+            logger.error(
+                "Unexpected error %s on %s %s: %s | query=%s path_params=%s attrs=%s",
+                error_type,
+                request.method,
+                request.url.path,
+                e,
+                request.query_params,
+                request.path_params,
+                safe_attrs,
+                exc_info=None if getattr(e, 'is_handled', False) else e,
+                extra={
+                    "path": request.url.path,
+                    "method": request.method,
+                    "error_type": error_type,
+                    "user_agent": request.headers.get("user-agent"),
+                    "request_id": request.headers.get("x-request-id"),
+                    "query": str(request.query_params),
+                    "path_params": request.path_params,
+                    "error_attrs": safe_attrs
+                }
+            )
+            
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Request headers: %s", loggable_headers(request.headers))
+        except Exception as log_err:
+            # Si hay un error al registrar el error, registrar esto también
+            logger.error("Error logging exception: %s", log_err)
+
+
+# Alias para compatibilidad: ErrorHandler era un stub ASGI separado; ahora es
+# la misma clase, para que ambos nombres registren el mismo middleware
+ErrorHandler = ErrorHandlerMiddleware
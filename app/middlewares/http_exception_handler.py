@@ -5,16 +5,45 @@ This module provides handlers for HTTP exceptions in the API.
 It formats HTTP exceptions to provide consistent error responses.
 """
 
-from fastapi import Request, status
-from fastapi.responses import JSONResponse
+from fastapi import Request, Response, status
+from fastapi.responses import ORJSONResponse as JSONResponse
 from fastapi.exceptions import RequestValidationError, HTTPException
-from typing import Dict, Any, Union, List
-from app.utils.logging_config import get_logger
+from functools import lru_cache
+from http import HTTPStatus
+from typing import Dict, Any, Union, List, Tuple
+from app.utils.logging_config import get_logger, loggable_headers
+import logging
+import orjson
 
 # Usar nuestro sistema de logging centralizado
 logger = get_logger("http_exception_handler")
 
-async def http_exception_handler(request: Request, exc: HTTPException) -> JSONResponse:
+# Maximum request body size (in bytes) logged for validation errors
+MAX_LOGGED_BODY_BYTES = 8192
+
+# Longest HTTPException detail whose encoded response is memoized
+MAX_CACHED_DETAIL_LENGTH = 256
+
+# Error types produced by the API handlers
+KNOWN_ERROR_TYPES = (
+    "http_error",
+    "validation_error",
+    "value_error",
+    "database_error",
+    "internal_server_error"
+)
+
+# Pre-encoded JSON fragments for the fixed part of the error responses, per
+# (error_type, status_code). Only the message needs to be encoded per response
+_ERROR_PREFIX = b'{"error":{"message":'
+_ERROR_SUFFIXES: Dict[Tuple[str, int], bytes] = {
+    (error_type, http_status.value):
+        b',"type":"%s","status_code":%d}}' % (error_type.encode(), http_status.value)
+    for error_type in KNOWN_ERROR_TYPES
+    for http_status in HTTPStatus
+}
+
+async def http_exception_handler(request: Request, exc: HTTPException) -> Response:
     """
     Handle HTTP exceptions.
     
@@ -23,23 +52,35 @@ async def http_exception_handler(request: Request, exc: HTTPException) -> JSONRe
         exc: The HTTP exception
         
     Returns:
-        JSONResponse: Formatted error response
+        Response: Formatted JSON error response
     """
-    logger.warning(f"HTTP exception: {exc.status_code} - {exc.detail}")
-    logger.warning(f"Request path: {request.url.path}")
-    logger.warning(f"Request method: {request.method}")
+    logger.warning(
+        "HTTP exception %s on %s %s: %s",
+        exc.status_code,
+        request.method,
+        request.url.path,
+        exc.detail,
+        extra={
+            "status": exc.status_code,
+            "detail": exc.detail,
+            "path": request.url.path,
+            "method": request.method
+        }
+    )
     
-    # Log headers only in debug level
-    logger.debug(f"Request headers: {request.headers}")
+    # Log a capped, redacted subset of the headers only in debug level
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Request headers: %s", loggable_headers(request.headers))
     
-    return JSONResponse(
-        status_code=exc.status_code,
-        content=format_error_response(
-            message=exc.detail,
-            error_type="http_error",
-            status_code=exc.status_code
-        )
-    )
+    # Los mensajes cortos se repiten mucho (404, 403...), así que su cuerpo
+    # codificado se reutiliza; el resto se serializa en cada llamada
+    detail = exc.detail
+    if isinstance(detail, str) and len(detail) <= MAX_CACHED_DETAIL_LENGTH:
+        body = _encoded_error(exc.status_code, detail, "http_error")
+    else:
+        body = encode_error_response(detail, "http_error", exc.status_code)
+    
+    return Response(content=body, status_code=exc.status_code, media_type="application/json")
 
 async def validation_exception_handler(request: Request, exc: RequestValidationError) -> JSONResponse:
     """
@@ -52,26 +93,26 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     Returns:
         JSONResponse: Formatted error response with validation details
     """
-    errors = []
-    for error in exc.errors():
-        error_detail = {
-            "loc": error.get("loc", []),
-            "msg": error.get("msg", ""),
-            "type": error.get("type", "")
-        }
-        errors.append(error_detail)
+    # Pydantic always includes loc, msg and type in each error
+    errors = [
+        {"loc": error["loc"], "msg": error["msg"], "type": error["type"]}
+        for error in exc.errors()
+    ]
     
-    logger.warning(f"Validation error on {request.url.path}: {errors}")
-    logger.debug(f"Request method: {request.method}")
+    logger.warning("Validation error on %s: %s", request.url.path, errors)
+    logger.debug("Request method: %s", request.method)
     
-    try:
-        # Log request body if available (useful for debugging validation errors)
-        body = await request.body()
-        if body:
-            body_text = body.decode('utf-8', errors='replace')
-            logger.debug(f"Request body: {body_text}")
-    except Exception as e:
-        logger.debug(f"Could not read request body: {str(e)}")
+    # Log request body if available (useful for debugging validation errors).
+    # Only read it when DEBUG logging is enabled, and skip decoding large bodies
+    if logger.isEnabledFor(logging.DEBUG):
+        try:
+            body = await request.body()
+            if len(body) > MAX_LOGGED_BODY_BYTES:
+                logger.debug("Request body: <%d bytes omitted>", len(body))
+            elif body:
+                logger.debug("Request body: %s", body.decode('utf-8', errors='replace'))
+        except Exception as e:
+            logger.debug("Could not read request body: %s", e)
     
     return JSONResponse(
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
@@ -112,4 +153,40 @@ def format_error_response(
     if errors:
         response["error"]["details"] = errors
     
-    return response 
\ No newline at end of file
+    return response
+
+def encode_error_response(message: Any, error_type: str, status_code: int) -> bytes:
+    """
+    Encode an error response (without details) to JSON bytes.
+    
+    For known error types and standard status codes only the message is
+    encoded; the rest of the body comes from pre-encoded fragments. Any other
+    combination falls back to encoding format_error_response().
+    
+    Args:
+        message: Error message
+        error_type: Type of error
+        status_code: HTTP status code
+        
+    Returns:
+        bytes: JSON-encoded error response
+    """
+    suffix = _ERROR_SUFFIXES.get((error_type, status_code))
+    if suffix is None or not isinstance(message, str):
+        return orjson.dumps(format_error_response(message, error_type, status_code))
+    return _ERROR_PREFIX + orjson.dumps(message) + suffix
+
+@lru_cache(maxsize=256)
+def _encoded_error(status_code: int, message: str, error_type: str) -> bytes:
+    """
+    Encode an error response body, memoized per (status_code, message, error_type).
+    
+    Args:
+        status_code: HTTP status code
+        message: Error message
+        error_type: Type of error
+        
+    Returns:
+        bytes: JSON-encoded error response
+    """
+    return encode_error_response(message, error_type, status_code)
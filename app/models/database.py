@@ -4,34 +4,62 @@ Database Configuration Module
 This module sets up the SQLAlchemy database connection and session management.
 It configures the database engine, session factory, and base model class.
 
-The database URL is read from environment variables, with a default value
-provided for development environments.
+The database URL is read from the application configuration (app.config).
 """
 
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-import os
-from dotenv import load_dotenv
-
-# Load environment variables from .env file
-load_dotenv()
-  
-# Get database URL from environment variables with a default fallback
-DATABASE_URL = os.getenv("DATABASE_URL", "")
+
+from app.config import DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_RECYCLE
+
+# The database URL is required
 if not DATABASE_URL:
     raise ValueError("No DATABASE_URL set in environment variables. This is required for database connection.")
 
-# Limpiar la URL de posibles caracteres de nueva línea u otros caracteres no deseados
-DATABASE_URL = DATABASE_URL.strip()
-
 # Create database engine with the configured URL
-engine = create_engine(DATABASE_URL)
+# For server databases keep a pool of reusable connections: pre-ping drops dead
+# connections before use, recycling avoids server-side idle timeouts and LIFO
+# checkout keeps a small set of hot connections in use so idle ones can time out
+if DATABASE_URL.startswith("sqlite"):
+    if make_url(DATABASE_URL).database in (None, "", ":memory:"):
+        # In-memory databases live in a single connection, so there is nothing to pool
+        engine = create_engine(DATABASE_URL)
+    else:
+        # SQLAlchemy already pools file connections (5 + 10 by default); size the pool
+        # like the server databases so every request thread keeps a warm connection
+        engine = create_engine(
+            DATABASE_URL,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW
+        )
+else:
+    # Multi-row INSERTs are grouped into pages of VALUES tuples; with psycopg2,
+    # executemany UPDATE/DELETE statements are also sent in batches instead of
+    # one round-trip per row
+    driver_options = {"insertmanyvalues_page_size": 1000}
+    if make_url(DATABASE_URL).get_driver_name() == "psycopg2":
+        driver_options.update(
+            executemany_mode="values_plus_batch",
+            executemany_batch_page_size=500
+        )
+
+    engine = create_engine(
+        DATABASE_URL,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_pre_ping=True,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_use_lifo=True,
+        **driver_options
+    )
 
 # Create session factory for database interactions
 # autocommit=False: Transactions must be explicitly committed
 # autoflush=False: Changes won't be automatically flushed to the database
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False: Loaded attributes stay usable after commit without reloading them
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 # Create base class for declarative model definitions
 Base = declarative_base()
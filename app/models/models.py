@@ -9,27 +9,64 @@ Models:
 - Family: Represents a group of people sharing expenses
 - Member: Represents a person belonging to a family
 - Expense: Represents a financial expense paid by a member and split among others
+- ExpenseShare: Represents the part of an expense owed by one member
 - Payment: Represents a money transfer between two members
 """
 
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Table, DateTime, Enum
+from sqlalchemy import CheckConstraint, Column, Integer, SmallInteger, String, Numeric, ForeignKey, DateTime, Index, Uuid, text
+from sqlalchemy.types import TypeDecorator
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
-from sqlalchemy.dialects.postgresql import UUID
-import uuid
+from datetime import datetime, timezone
+import os
+import time
 import enum
 from .database import Base
 
+# Identificadores: UUID nativo en PostgreSQL (16 bytes), expuestos como str en Python
+UUIDString = Uuid(as_uuid=False)
+
+# Importes monetarios: NUMERIC(12,2) exacto en la base de datos, expuestos como float en Python
+Money = Numeric(12, 2, asdecimal=False)
+
 def generate_uuid():
     """
-    Generate a UUID string for use as a primary key.
+    Generate a UUIDv7 string for use as a primary key.
+    
+    UUIDv7 (RFC 9562) starts with a 48-bit millisecond timestamp followed by
+    random bits, so new keys are roughly increasing and inserts append to the
+    end of the primary key index instead of splitting random pages.
     
     Returns:
         str: A new UUID in string format
     """
-    return str(uuid.uuid4())
+    timestamp_ms = time.time_ns() // 1_000_000
+    rand = int.from_bytes(os.urandom(10), "big")
+    value = (
+        (timestamp_ms & 0xFFFF_FFFF_FFFF) << 80  # unix_ts_ms
+        | 0x7 << 76                                # version
+        | ((rand >> 62) & 0xFFF) << 64             # rand_a
+        | 0b10 << 62                               # variant
+        | rand & 0x3FFF_FFFF_FFFF_FFFF             # rand_b
+    )
+    # Formatear el hexadecimal directamente evita construir un objeto uuid.UUID
+    digits = f"{value:032x}"
+    return f"{digits[:8]}-{digits[8:12]}-{digits[12:16]}-{digits[16:20]}-{digits[20:]}"
+
+def utcnow():
+    """
+    Get the current time in UTC for updated_at columns.
+    
+    The value is generated in Python rather than by the database so it keeps
+    microsecond precision in every backend (SQLite's CURRENT_TIMESTAMP only has
+    second precision) and successive changes get different timestamps.
+    
+    Returns:
+        datetime: The current time, timezone-aware
+    """
+    return datetime.now(timezone.utc)
 
-class PaymentStatus(enum.Enum):
+class PaymentStatus(str, enum.Enum):
     """
     Enum for payment status values.
     
@@ -42,7 +79,7 @@ class PaymentStatus(enum.Enum):
     CONFIRM = "CONFIRM"
     INACTIVE = "INACTIVE"
 
-class Language(enum.Enum):
+class Language(str, enum.Enum):
     """
     Enum for language preference.
     
@@ -55,13 +92,89 @@ class Language(enum.Enum):
     ES = "ES"
     FR = "FR"
 
+class EnumCode(TypeDecorator):
+    """
+    Store a Python enum as a SMALLINT code.
+    
+    Subclasses set enum_class and codes (enum member -> code). Values are
+    stored as 2-byte integers instead of a native ENUM type, and are
+    converted back to enum members when loaded. The codes are part of the
+    stored data, so existing codes must never be changed.
+    """
+    impl = SmallInteger
+    cache_ok = True
+    
+    enum_class = None
+    codes = {}
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._members_by_code = {code: member for member, code in cls.codes.items()}
+    
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        # Aceptar también el valor (p. ej. "CONFIRM") o enums equivalentes de los schemas
+        return self.codes[self.enum_class(value)]
+    
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return self._members_by_code[value]
+
+class PaymentStatusCode(EnumCode):
+    """SMALLINT storage for PaymentStatus."""
+    cache_ok = True
+    enum_class = PaymentStatus
+    codes = {
+        PaymentStatus.PENDING: 0,
+        PaymentStatus.CONFIRM: 1,
+        PaymentStatus.INACTIVE: 2
+    }
+
+class LanguageCode(EnumCode):
+    """SMALLINT storage for Language."""
+    cache_ok = True
+    enum_class = Language
+    codes = {
+        Language.EN: 0,
+        Language.ES: 1,
+        Language.FR: 2
+    }
+
+class ExpenseShare(Base):
+    """
+    Share of an expense assigned to one member.
+    
+    Association between expenses and the members who split them. Each row stores
+    the member's part of the expense and the family it belongs to, so balances
+    can be aggregated in SQL without dividing amounts in Python.
+    
+    Attributes:
+        expense_id (str): ID of the shared expense
+        member_id (str): ID of the member sharing the expense
+        family_id (str): ID of the family of the expense (denormalized)
+        amount_share (float): Part of the expense amount owed by the member
+        expense (relationship): The shared expense
+        member (relationship): The member sharing the expense
+    """
+    __tablename__ = "expense_member_association"
+    __table_args__ = (
+        Index("ix_expense_member_association_member_id_expense_id", "member_id", "expense_id"),
+        Index("ix_expense_member_association_family_id_member_id", "family_id", "member_id"),
+    )
+
+    expense_id = Column(UUIDString, ForeignKey("expenses.id"), primary_key=True)
+    member_id = Column(UUIDString, ForeignKey("members.id"), primary_key=True)
+    family_id = Column(UUIDString, ForeignKey("families.id"))
+    amount_share = Column(Money, nullable=False, default=0.0)
+    
+    # Relationships
+    expense = relationship("Expense", back_populates="shares")
+    member = relationship("Member", back_populates="expense_shares")
+
 # Many-to-many association table between expenses and members
-expense_member_association = Table(
-    'expense_member_association',
-    Base.metadata,
-    Column('expense_id', String(36), ForeignKey('expenses.id')),
-    Column('member_id', String(36), ForeignKey('members.id'))
-)
+expense_member_association = ExpenseShare.__table__
 
 class Family(Base):
     """
@@ -77,12 +190,14 @@ class Family(Base):
     """
     __tablename__ = "families"
 
-    id = Column(String(36), primary_key=True, default=generate_uuid, index=True)
-    name = Column(String, index=True)
+    id = Column(UUIDString, primary_key=True, default=generate_uuid)
+    name = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
-    members = relationship("Member", back_populates="family")
+    # Los miembros se serializan siempre junto con la familia, por lo que se
+    # cargan con una única consulta IN en lugar de una por familia
+    members = relationship("Member", back_populates="family", lazy="selectin")
     expenses = relationship("Expense", back_populates="family")
     payments = relationship("Payment", back_populates="family")
 
@@ -97,27 +212,37 @@ class Member(Base):
         family_id (str): ID of the family this member belongs to
         language (Language): Preferred language for notifications and interface
         created_at (datetime): When the member was created
+        updated_at (datetime): When the member was last modified
         family (relationship): The family this member belongs to
         expenses_paid (relationship): Expenses paid by this member
         payments_made (relationship): Payments sent by this member
         payments_received (relationship): Payments received by this member
-        expenses_split (relationship): Expenses this member is part of
+        expenses_split (relationship): Expenses this member is part of (read-only)
+        expense_shares (relationship): Shares of the expenses this member is part of
     """
     __tablename__ = "members"
+    __table_args__ = (
+        Index("ix_members_family_id", "family_id"),
+    )
 
-    id = Column(String(36), primary_key=True, default=generate_uuid, index=True)
-    name = Column(String, index=True)
+    id = Column(UUIDString, primary_key=True, default=generate_uuid)
+    name = Column(String)
     telegram_id = Column(String, unique=True, index=True)
-    family_id = Column(String(36), ForeignKey("families.id"))
-    language = Column(Enum(Language), default=Language.EN, nullable=False)
+    family_id = Column(UUIDString, ForeignKey("families.id"))
+    language = Column(LanguageCode, default=Language.EN, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow)
     
     # Relationships
     family = relationship("Family", back_populates="members")
     expenses_paid = relationship("Expense", back_populates="paid_by_member")
     payments_made = relationship("Payment", foreign_keys="Payment.from_member_id", back_populates="from_member")
     payments_received = relationship("Payment", foreign_keys="Payment.to_member_id", back_populates="to_member")
-    expenses_split = relationship("Expense", secondary=expense_member_association, back_populates="split_among")
+    # Las filas de la asociación se escriben a través de expense_shares
+    expenses_split = relationship(
+        "Expense", secondary=expense_member_association, back_populates="split_among", viewonly=True
+    )
+    expense_shares = relationship("ExpenseShare", back_populates="member", cascade="all, delete-orphan")
 
 class Expense(Base):
     """
@@ -130,23 +255,39 @@ class Expense(Base):
         paid_by (str): ID of the member who paid for the expense
         family_id (str): ID of the family this expense belongs to
         created_at (datetime): When the expense was created
+        updated_at (datetime): When the expense was last modified
         paid_by_member (relationship): The member who paid for the expense
         family (relationship): The family this expense belongs to
-        split_among (relationship): Members who share this expense
+        split_among (relationship): Members who share this expense (read-only)
+        shares (relationship): Per-member shares of this expense
     """
     __tablename__ = "expenses"
+    __table_args__ = (
+        # Gastos de una familia (y de un pagador dentro de ella) y gastos por pagador;
+        # el id incluido permite unir con las partes del gasto sin leer la tabla
+        Index("ix_expenses_family_id_paid_by", "family_id", "paid_by"),
+        Index("ix_expenses_paid_by", "paid_by", postgresql_include=["id"]),
+    )
 
-    id = Column(String(36), primary_key=True, default=generate_uuid, index=True)
-    description = Column(String, index=True)
-    amount = Column(Float)
-    paid_by = Column(String(36), ForeignKey("members.id"))
-    family_id = Column(String(36), ForeignKey("families.id"))
+    id = Column(UUIDString, primary_key=True, default=generate_uuid)
+    description = Column(String)
+    amount = Column(Money)
+    paid_by = Column(UUIDString, ForeignKey("members.id"))
+    family_id = Column(UUIDString, ForeignKey("families.id"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow)
     
     # Relationships
     paid_by_member = relationship("Member", back_populates="expenses_paid")
     family = relationship("Family", back_populates="expenses")
-    split_among = relationship("Member", secondary=expense_member_association, back_populates="expenses_split")
+    # Se serializa con cada gasto y se recorre en el cálculo de balances: cargar
+    # los miembros de todos los gastos de una consulta evita N+1 consultas
+    # Las filas de la asociación se escriben a través de shares
+    split_among = relationship(
+        "Member", secondary=expense_member_association, back_populates="expenses_split",
+        lazy="selectin", viewonly=True
+    )
+    shares = relationship("ExpenseShare", back_populates="expense", cascade="all, delete-orphan")
 
 class Payment(Base):
     """
@@ -160,21 +301,40 @@ class Payment(Base):
         status (PaymentStatus): Current status of the payment
         family_id (str): ID of the family this payment belongs to
         created_at (datetime): When the payment was created
+        updated_at (datetime): When the payment was last modified
         from_member (relationship): The member sending the payment
         to_member (relationship): The member receiving the payment
         family (relationship): The family this payment belongs to
     """
     __tablename__ = "payments"
+    __table_args__ = (
+        # Los balances solo suman pagos confirmados de una familia; las columnas
+        # incluidas permiten leerlos solo desde el índice
+        Index(
+            "ix_payments_family_id_confirmed",
+            "family_id",
+            postgresql_where=text(f"status = {PaymentStatusCode.codes[PaymentStatus.CONFIRM]}"),
+            postgresql_include=["id", "from_member_id", "to_member_id", "amount"]
+        ),
+        # Pagos enviados o recibidos por un miembro
+        Index("ix_payments_from_member_id_family_id", "from_member_id", "family_id"),
+        Index("ix_payments_to_member_id_family_id", "to_member_id", "family_id"),
+        # Un pago va siempre de un miembro a otro distinto y por un importe positivo
+        CheckConstraint("from_member_id <> to_member_id", name="chk_payment_distinct_members"),
+        CheckConstraint("amount > 0", name="chk_payment_positive"),
+    )
 
-    id = Column(String(36), primary_key=True, default=generate_uuid, index=True)
-    from_member_id = Column(String(36), ForeignKey("members.id"))
-    to_member_id = Column(String(36), ForeignKey("members.id"))
-    amount = Column(Float)
-    status = Column(Enum(PaymentStatus), default=PaymentStatus.PENDING, nullable=False)
-    family_id = Column(String(36), ForeignKey("families.id"))
+    id = Column(UUIDString, primary_key=True, default=generate_uuid)
+    from_member_id = Column(UUIDString, ForeignKey("members.id"))
+    to_member_id = Column(UUIDString, ForeignKey("members.id"))
+    amount = Column(Money)
+    status = Column(PaymentStatusCode, default=PaymentStatus.PENDING, nullable=False)
+    family_id = Column(UUIDString, ForeignKey("families.id"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow)
     
     # Relationships
-    from_member = relationship("Member", foreign_keys=[from_member_id], back_populates="payments_made")
-    to_member = relationship("Member", foreign_keys=[to_member_id], back_populates="payments_received")
+    # Emisor y receptor se serializan en cada respuesta de pago
+    from_member = relationship("Member", foreign_keys=[from_member_id], back_populates="payments_made", lazy="selectin")
+    to_member = relationship("Member", foreign_keys=[to_member_id], back_populates="payments_received", lazy="selectin")
     family = relationship("Family", back_populates="payments") 
\ No newline at end of file
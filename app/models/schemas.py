@@ -9,11 +9,37 @@ The schemas are organized by resource type (auth, members, families, expenses, p
 and include base models, creation models, update models, and response models.
 """
 
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from functools import lru_cache
+import uuid
+from pydantic import AfterValidator, BaseModel, ConfigDict, Field, TypeAdapter, WrapValidator
+from typing import Annotated, List, Optional
 from datetime import datetime
-import enum
-from app.models.models import Language as DBLanguage
+# Los schemas usan los mismos enums que los modelos: los valores leídos de la
+# base de datos ya son instancias válidas y Pydantic no tiene que convertirlos
+from app.models.models import Language, PaymentStatus
+
+def normalize_uuid(value: str) -> str:
+    """
+    Validate a UUID string and return it in canonical form.
+    
+    Ids are stored as native UUID in PostgreSQL, where a malformed value makes
+    the query fail instead of matching nothing, so they are rejected with a
+    validation error before reaching the database. Uppercase or unhyphenated
+    UUIDs are normalised to the lowercase hyphenated form the database returns.
+    
+    Args:
+        value: The UUID string to validate
+        
+    Returns:
+        str: The UUID in lowercase hyphenated form
+        
+    Raises:
+        ValueError: If the value is not a valid UUID
+    """
+    return str(uuid.UUID(value))
+
+# Identificador recibido en rutas y cuerpos de petición: UUID validado, expuesto como str
+UUIDStr = Annotated[str, AfterValidator(normalize_uuid)]
 
 # Authentication schemas
 class Token(BaseModel):
@@ -27,28 +53,23 @@ class Token(BaseModel):
     access_token: str
     token_type: str
 
-class TokenData(BaseModel):
+class TokenRequest(BaseModel):
     """
-    Token data schema for decoded JWT payload.
+    JSON body for requesting an access token.
     
     Attributes:
-        username (Optional[str]): Username extracted from the token
+        telegram_id (str): Telegram ID of the member
     """
-    username: Optional[str] = None
+    telegram_id: str
 
-# Language enum for Pydantic models
-class Language(str, enum.Enum):
+class TokenData(BaseModel):
     """
-    Enum for language preference.
+    Token data schema for decoded JWT payload.
     
     Attributes:
-        EN: English
-        ES: Spanish
-        FR: French
+        username (Optional[str]): Username extracted from the token
     """
-    EN = "EN"
-    ES = "ES"
-    FR = "FR"
+    username: Optional[str] = None
 
 # Member schemas
 class MemberBase(BaseModel):
@@ -98,8 +119,36 @@ class Member(MemberBase):
     family_id: str
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    # Esquema solo de respuesta: inmutable, ya que las instancias cacheadas se comparten
+    model_config = ConfigDict(from_attributes=True, frozen=True)
+
+@lru_cache(maxsize=4096)
+def _member_from_fields(id, name, telegram_id, language, family_id, created_at) -> Member:
+    """Build a Member schema once per distinct set of field values."""
+    return Member(
+        id=id, name=name, telegram_id=telegram_id, language=language,
+        family_id=family_id, created_at=created_at
+    )
+
+def _reuse_member(value, handler):
+    """
+    Validate a member embedded in another response using the cached schema.
+    
+    The same few members are embedded in every expense and payment of a family;
+    keying the cache on all of their fields means any change to a member
+    produces a new entry instead of a stale one.
+    """
+    try:
+        return _member_from_fields(
+            value.id, value.name, value.telegram_id, value.language,
+            value.family_id, value.created_at
+        )
+    except (AttributeError, TypeError):
+        # No es un objeto con atributos de miembro (p. ej. un dict): validación normal
+        return handler(value)
+
+# Miembro incrustado en las respuestas de gastos y pagos
+EmbeddedMember = Annotated[Member, WrapValidator(_reuse_member)]
 
 # Family schemas
 class FamilyBase(BaseModel):
@@ -131,10 +180,9 @@ class Family(FamilyBase):
     """
     id: str
     created_at: datetime
-    members: List[Member] = []
+    members: List[Member] = Field(default_factory=list)
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True, frozen=True)
 
 # Expense schemas
 class ExpenseBase(BaseModel):
@@ -155,9 +203,11 @@ class ExpenseCreate(ExpenseBase):
     Schema for creating a new expense.
     
     Attributes:
+        paid_by (str): ID of the member who paid for the expense (a valid UUID)
         split_among (Optional[List[str]]): IDs of members who share this expense
     """
-    split_among: Optional[List[str]] = None
+    paid_by: UUIDStr
+    split_among: Optional[List[UUIDStr]] = None
 
 class ExpenseUpdate(BaseModel):
     """
@@ -172,8 +222,8 @@ class ExpenseUpdate(BaseModel):
     """
     description: Optional[str] = None
     amount: Optional[float] = None
-    paid_by: Optional[str] = None
-    split_among: Optional[List[str]] = None
+    paid_by: Optional[UUIDStr] = None
+    split_among: Optional[List[UUIDStr]] = None
 
 class Expense(ExpenseBase):
     """
@@ -188,25 +238,11 @@ class Expense(ExpenseBase):
     id: str
     family_id: str
     created_at: datetime
-    split_among: List[Member] = []
+    split_among: List[EmbeddedMember] = Field(default_factory=list)
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True, frozen=True)
 
 # Payment schemas
-class PaymentStatus(str, enum.Enum):
-    """
-    Enum for payment status values.
-    
-    Attributes:
-        PENDING: Payment has been created but not confirmed by the recipient
-        CONFIRM: Payment has been confirmed by the recipient
-        INACTIVE: Payment has been rejected or cancelled
-    """
-    PENDING = "PENDING"
-    CONFIRM = "CONFIRM"
-    INACTIVE = "INACTIVE"
-
 class PaymentBase(BaseModel):
     """
     Base schema for payment data.
@@ -214,11 +250,11 @@ class PaymentBase(BaseModel):
     Attributes:
         from_member (str): ID of the member sending the payment
         to_member (str): ID of the member receiving the payment
-        amount (float): The monetary amount of the payment
+        amount (float): The monetary amount of the payment (must be positive)
     """
-    from_member: str
-    to_member: str
-    amount: float
+    from_member: UUIDStr
+    to_member: UUIDStr
+    amount: float = Field(..., gt=0)
 
 class PaymentCreate(PaymentBase):
     """
@@ -254,15 +290,14 @@ class Payment(BaseModel):
         created_at (datetime): When the payment was created
     """
     id: str
-    from_member: Member
-    to_member: Member
+    from_member: EmbeddedMember
+    to_member: EmbeddedMember
     amount: float
     status: PaymentStatus
     family_id: str
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True, frozen=True)
 
 # Balance schemas
 class DebtDetail(BaseModel):
@@ -278,8 +313,10 @@ class DebtDetail(BaseModel):
     to_name: str = Field(..., alias="to")
     amount: float
     
+    # Inmutable: los balances cacheados se comparten entre peticiones
     model_config = {
         "populate_by_name": True,
+        "frozen": True,
         "json_schema_extra": {
             "example": {
                 "to_id": "abc123",
@@ -302,8 +339,10 @@ class CreditDetail(BaseModel):
     from_name: str = Field(..., alias="from")
     amount: float
 
+    # Inmutable: los balances cacheados se comparten entre peticiones
     model_config = {
         "populate_by_name": True,
+        "frozen": True,
         "json_schema_extra": {
             "example": {
                 "from_id": "abc123",
@@ -331,9 +370,45 @@ class MemberBalance(BaseModel):
     total_debt: float
     total_owed: float
     net_balance: float
-    debts: List[DebtDetail] = []
-    credits: List[CreditDetail] = []
+    debts: List[DebtDetail] = Field(default_factory=list)
+    credits: List[CreditDetail] = Field(default_factory=list)
 
+    # Inmutable: los balances cacheados se comparten entre peticiones
     model_config = {
-        "populate_by_name": True
-    } 
\ No newline at end of file
+        "populate_by_name": True,
+        "frozen": True
+    }
+
+# Adaptadores de listas, construidos una sola vez al importar el módulo y
+# reutilizados por los endpoints que devuelven colecciones
+MemberListAdapter = TypeAdapter(List[Member])
+ExpenseListAdapter = TypeAdapter(List[Expense])
+PaymentListAdapter = TypeAdapter(List[Payment])
+# Los balances ya son modelos validados: se codifican directamente con los alias "to"/"from"
+MemberBalanceListAdapter = TypeAdapter(List[MemberBalance])
+
+def dump_model_json(model: type, obj) -> bytes:
+    """
+    Validate an ORM object with a response schema and encode it as JSON.
+
+    Args:
+        model: Response schema class (e.g. Expense)
+        obj: ORM object to serialize
+
+    Returns:
+        bytes: JSON object with the serialized item
+    """
+    return model.model_validate(obj).model_dump_json().encode()
+
+def dump_list_json(adapter: TypeAdapter, items) -> bytes:
+    """
+    Validate ORM objects with a prebuilt list adapter and encode them as JSON.
+
+    Args:
+        adapter: One of the list adapters defined in this module
+        items: ORM objects to serialize
+
+    Returns:
+        bytes: JSON array with the serialized items
+    """
+    return adapter.dump_json(adapter.validate_python(items, from_attributes=True))
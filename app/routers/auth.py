@@ -10,8 +10,9 @@ from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 import logging
 
+from app.auth.auth import authenticate_member
 from app.models.database import get_db
-from app.models.schemas import Token
+from app.models.schemas import Token, TokenRequest
 from app.services.member_service import MemberService
 from app.services.token_service import create_access_token
 from app.utils.logging_config import get_logger
@@ -24,6 +25,46 @@ router = APIRouter(
 
 logger = get_logger(__name__)
 
+def _issue_token(telegram_id: str, db: Session) -> dict:
+    """
+    Authenticate a member by Telegram ID and build the token response.
+    
+    Args:
+        telegram_id: Telegram ID of the member
+        db: Database session
+        
+    Returns:
+        dict: The access token and its type
+        
+    Raises:
+        HTTPException: If no member has that Telegram ID
+    """
+    logger.info("Auth attempt for username: %s", telegram_id)
+    
+    # Un telegram_id resuelto recientemente (aquí o al validar un token) ya se
+    # sabe que pertenece a un miembro, así que no hace falta consultar la base de datos
+    if MemberService.get_cached_member_id(telegram_id) is None:
+        # Buscar al miembro por su telegram_id (que usamos como username); los
+        # telegram_id desconocidos también se cachean durante unos segundos
+        member = authenticate_member(telegram_id, db)
+        
+        # La autenticación actual usa solo telegram_id sin verificar contraseña
+        # En un sistema real, se debe verificar la contraseña aquí
+        if not member:
+            logger.warning("Authentication failed for username: %s", telegram_id)
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Incorrect username or password",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        MemberService.cache_member_id(member.telegram_id, member.id)
+    
+    # Crear un token de acceso usando el telegram_id como sub (subject)
+    access_token = create_access_token(data={"sub": telegram_id})
+    
+    logger.info("Authentication successful for username: %s", telegram_id)
+    return {"access_token": access_token, "token_type": "bearer"}
+
 @router.post("/token", response_model=Token)
 def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
@@ -42,23 +83,28 @@ def login_for_access_token(
     Raises:
         HTTPException: If authentication fails
     """
-    logger.info(f"Auth attempt for username: {form_data.username}")
-    
-    # Buscar al miembro por su telegram_id (que usamos como username)
-    member = MemberService.get_member_by_telegram_id(db, form_data.username)
-    
-    # La autenticación actual usa solo telegram_id sin verificar contraseña
-    # En un sistema real, se debe verificar la contraseña aquí
-    if not member:
-        logger.warning(f"Authentication failed for username: {form_data.username}")
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Incorrect username or password",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+    return _issue_token(form_data.username, db)
+
+@router.post("/token_json", response_model=Token)
+def login_for_access_token_json(
+    token_request: TokenRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Generate an access token for a member from a JSON body.
     
-    # Crear un token de acceso usando el telegram_id como sub (subject)
-    access_token = create_access_token(data={"sub": member.telegram_id})
+    Equivalent to /auth/token for clients such as the Telegram bot, which only
+    send a Telegram ID: the JSON body avoids parsing an OAuth2 form whose
+    password is ignored.
     
-    logger.info(f"Authentication successful for username: {form_data.username}")
-    return {"access_token": access_token, "token_type": "bearer"} 
\ No newline at end of file
+    Args:
+        token_request: JSON body with the member's Telegram ID
+        db: Database session
+        
+    Returns:
+        Token: An OAuth2 compatible token
+        
+    Raises:
+        HTTPException: If authentication fails
+    """
+    return _issue_token(token_request.telegram_id, db)
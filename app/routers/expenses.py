@@ -6,13 +6,14 @@ It provides routes for creating, retrieving, updating, and deleting expenses,
 as well as getting expenses by member or family.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import logging
 
 from app.models.database import get_db
-from app.models.schemas import Expense, ExpenseCreate, ExpenseUpdate
+from app.models.schemas import Expense, ExpenseCreate, ExpenseUpdate, ExpenseListAdapter, dump_list_json, dump_model_json, UUIDStr
 from app.services.expense_service import ExpenseService
 from app.services.member_service import MemberService
 from app.utils.logging_config import get_logger
@@ -25,6 +26,53 @@ router = APIRouter(
 
 logger = get_logger(__name__)
 
+def _get_authorized_expense(db: Session, expense_id: str, telegram_id: Optional[str], action: str):
+    """
+    Get an expense, checking that the requesting user may access it.
+    
+    Args:
+        db: Database session
+        expense_id: ID of the expense
+        telegram_id: Optional Telegram ID for permission validation
+        action: Action being performed ("view", "update" or "delete"), used in error messages
+        
+    Returns:
+        models.Expense: The expense
+        
+    Raises:
+        HTTPException: If the expense or the requesting member is not found, or the
+                      user doesn't belong to the expense's family
+    """
+    expense = ExpenseService.get_expense(db, expense_id)
+    if not expense:
+        logger.warning("Expense not found with ID: %s", expense_id)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Expense not found"
+        )
+    
+    # If a telegram_id is provided, verify that the user belongs to the same family as the expense
+    if telegram_id:
+        # El gasto ya está cargado: basta con la familia del solicitante, que
+        # normalmente se obtiene de la caché sin consultar la base de datos
+        requesting_family_id = MemberService.get_member_family_id(db, telegram_id)
+        
+        if not requesting_family_id:
+            logger.warning("Member not found. Requesting member with telegram_id: %s", telegram_id)
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Member not found"
+            )
+            
+        if requesting_family_id != expense.family_id:
+            logger.warning("Permission denied for telegram_id: %s to %s expense: %s", telegram_id, action, expense_id)
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"You don't have permission to {action} this expense"
+            )
+    
+    return expense
+
 @router.post("/", response_model=Expense, status_code=status.HTTP_201_CREATED)
 def create_expense(
     expense: ExpenseCreate,
@@ -45,34 +93,39 @@ def create_expense(
     Raises:
         HTTPException: If the user doesn't have permission to create expenses for this member
     """
-    logger.info(f"Request to create expense: {expense.description}, amount: {expense.amount}, paid_by: {expense.paid_by}")
+    logger.info("Request to create expense: %s, amount: %s, paid_by: %s", expense.description, expense.amount, expense.paid_by)
     
     # If a telegram_id is provided, verify that the user belongs to the same family as the payer
     if telegram_id:
-        requesting_member = MemberService.get_member_by_telegram_id(db, telegram_id)
-        payer = MemberService.get_member(db, expense.paid_by)
+        # Solicitante y pagador se comprueban en una sola consulta
+        same_family = MemberService.verify_same_family(db, telegram_id, expense.paid_by)
         
-        if not requesting_member or not payer:
-            logger.warning(f"Member not found. Requesting member with telegram_id: {telegram_id} or payer with ID: {expense.paid_by}")
+        if same_family is None:
+            logger.warning("Member not found. Requesting member with telegram_id: %s or payer with ID: %s", telegram_id, expense.paid_by)
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Member not found"
             )
             
-        if requesting_member.family_id != payer.family_id:
-            logger.warning(f"Permission denied for telegram_id: {telegram_id} to create expense for member: {expense.paid_by}")
+        if not same_family:
+            logger.warning("Permission denied for telegram_id: %s to create expense for member: %s", telegram_id, expense.paid_by)
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You don't have permission to create expenses for this member"
             )
     
     created_expense = ExpenseService.create_expense(db, expense)
-    logger.info(f"Expense created successfully with ID: {created_expense.id}, family: {created_expense.family_id}")
-    return created_expense
+    logger.info("Expense created successfully with ID: %s, family: %s", created_expense.id, created_expense.family_id)
+    # Se valida una sola vez contra el esquema y se devuelve el JSON ya codificado
+    return Response(
+        content=dump_model_json(Expense, created_expense),
+        media_type="application/json",
+        status_code=status.HTTP_201_CREATED
+    )
 
 @router.get("/{expense_id}", response_model=Expense)
 def get_expense(
-    expense_id: str,
+    expense_id: UUIDStr,
     telegram_id: Optional[str] = Query(None, description="Telegram ID of the user"),
     db: Session = Depends(get_db)
 ):
@@ -90,41 +143,16 @@ def get_expense(
     Raises:
         HTTPException: If the expense is not found or the user doesn't have permission to view it
     """
-    logger.info(f"Request to get expense with ID: {expense_id}, requested by telegram_id: {telegram_id}")
+    logger.info("Request to get expense with ID: %s, requested by telegram_id: %s", expense_id, telegram_id)
     
-    expense = ExpenseService.get_expense(db, expense_id)
-    if not expense:
-        logger.warning(f"Expense not found with ID: {expense_id}")
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Expense not found"
-        )
+    expense = _get_authorized_expense(db, expense_id, telegram_id, "view")
     
-    # If a telegram_id is provided, verify that the user belongs to the same family as the payer
-    if telegram_id:
-        requesting_member = MemberService.get_member_by_telegram_id(db, telegram_id)
-        payer = MemberService.get_member(db, expense.paid_by)
-        
-        if not requesting_member or not payer:
-            logger.warning(f"Member not found. Requesting member with telegram_id: {telegram_id} or payer of expense: {expense_id}")
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Member not found"
-            )
-            
-        if requesting_member.family_id != payer.family_id:
-            logger.warning(f"Permission denied for telegram_id: {telegram_id} to view expense: {expense_id}")
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You don't have permission to view this expense"
-            )
-    
-    logger.info(f"Expense retrieved successfully: {expense.id}, description: '{expense.description}'")
-    return expense
+    logger.info("Expense retrieved successfully: %s, description: '%s'", expense.id, expense.description)
+    return Response(content=dump_model_json(Expense, expense), media_type="application/json")
 
 @router.put("/{expense_id}", response_model=Expense)
 def update_expense(
-    expense_id: str,
+    expense_id: UUIDStr,
     expense_update: ExpenseUpdate,
     telegram_id: Optional[str] = Query(None, description="Telegram ID of the user"),
     db: Session = Depends(get_db)
@@ -145,48 +173,22 @@ def update_expense(
         HTTPException: If the expense is not found, the user doesn't have permission to update it,
                       or the new payer doesn't belong to the same family
     """
-    logger.info(f"Request to update expense with ID: {expense_id}, requested by telegram_id: {telegram_id}")
+    logger.info("Request to update expense with ID: %s, requested by telegram_id: %s", expense_id, telegram_id)
     
-    # Verify that the expense exists
-    expense = ExpenseService.get_expense(db, expense_id)
-    if not expense:
-        logger.warning(f"Expense not found with ID: {expense_id}")
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Expense not found"
-        )
-    
-    # If a telegram_id is provided, verify that the user belongs to the same family as the payer
-    if telegram_id:
-        requesting_member = MemberService.get_member_by_telegram_id(db, telegram_id)
-        payer = MemberService.get_member(db, expense.paid_by)
-        
-        if not requesting_member or not payer:
-            logger.warning(f"Member not found. Requesting member with telegram_id: {telegram_id} or payer of expense: {expense_id}")
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Member not found"
-            )
-            
-        if requesting_member.family_id != payer.family_id:
-            logger.warning(f"Permission denied for telegram_id: {telegram_id} to update expense: {expense_id}")
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You don't have permission to update this expense"
-            )
+    expense = _get_authorized_expense(db, expense_id, telegram_id, "update")
     
     # If the payer is changed, verify that the new payer belongs to the same family
     if expense_update.paid_by is not None and expense_update.paid_by != expense.paid_by:
-        new_payer = MemberService.get_member(db, expense_update.paid_by)
-        if not new_payer:
-            logger.warning(f"New payer not found with ID: {expense_update.paid_by}")
+        new_payer_family_id = MemberService.get_family_id(db, expense_update.paid_by)
+        if not new_payer_family_id:
+            logger.warning("New payer not found with ID: %s", expense_update.paid_by)
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="New payer not found"
             )
             
-        if new_payer.family_id != expense.family_id:
-            logger.warning(f"Invalid payer update: New payer {expense_update.paid_by} belongs to family {new_payer.family_id}, but expense belongs to family {expense.family_id}")
+        if new_payer_family_id != expense.family_id:
+            logger.warning("Invalid payer update: New payer %s belongs to family %s, but expense belongs to family %s", expense_update.paid_by, new_payer_family_id, expense.family_id)
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="The new payer must belong to the same family"
@@ -195,18 +197,18 @@ def update_expense(
     # Update the expense
     updated_expense = ExpenseService.update_expense(db, expense_id, expense_update)
     if not updated_expense:
-        logger.error(f"Error updating expense with ID: {expense_id}")
+        logger.error("Error updating expense with ID: %s", expense_id)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Error updating the expense"
         )
     
-    logger.info(f"Expense updated successfully: {updated_expense.id}")
-    return updated_expense
+    logger.info("Expense updated successfully: %s", updated_expense.id)
+    return Response(content=dump_model_json(Expense, updated_expense), media_type="application/json")
 
 @router.get("/member/{member_id}", response_model=List[Expense])
 def get_member_expenses(
-    member_id: str,
+    member_id: UUIDStr,
     telegram_id: Optional[str] = Query(None, description="Telegram ID of the user"),
     db: Session = Depends(get_db)
 ):
@@ -224,11 +226,12 @@ def get_member_expenses(
     Raises:
         HTTPException: If the member is not found or the user doesn't have permission to view the expenses
     """
-    logger.info(f"Request to get expenses for member: {member_id}, requested by telegram_id: {telegram_id}")
+    logger.info("Request to get expenses for member: %s, requested by telegram_id: %s", member_id, telegram_id)
     
-    member = MemberService.get_member(db, member_id)
-    if not member:
-        logger.warning(f"Member not found with ID: {member_id}")
+    # Solo se necesita la familia del miembro para la comprobación de permisos
+    member_family_id = MemberService.get_family_id(db, member_id)
+    if not member_family_id:
+        logger.warning("Member not found with ID: %s", member_id)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Member not found"
@@ -236,29 +239,31 @@ def get_member_expenses(
     
     # If a telegram_id is provided, verify that the user belongs to the same family
     if telegram_id:
-        requesting_member = MemberService.get_member_by_telegram_id(db, telegram_id)
+        # La familia del solicitante se obtiene de la caché cuando es posible
+        requesting_family_id = MemberService.get_member_family_id(db, telegram_id)
         
-        if not requesting_member:
-            logger.warning(f"Requesting member not found with telegram_id: {telegram_id}")
+        if not requesting_family_id:
+            logger.warning("Requesting member not found with telegram_id: %s", telegram_id)
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Requesting member not found"
             )
             
-        if requesting_member.family_id != member.family_id:
-            logger.warning(f"Permission denied for telegram_id: {telegram_id} to view expenses for member: {member_id}")
+        if requesting_family_id != member_family_id:
+            logger.warning("Permission denied for telegram_id: %s to view expenses for member: %s", telegram_id, member_id)
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You don't have permission to view this member's expenses"
             )
     
     expenses = ExpenseService.get_expenses_by_member(db, member_id)
-    logger.info(f"Retrieved {len(expenses)} expenses for member: {member_id}")
-    return expenses
+    logger.info("Retrieved %s expenses for member: %s", len(expenses), member_id)
+    # Serializar con el adaptador precompilado evita la validación de respuesta de FastAPI
+    return Response(content=dump_list_json(ExpenseListAdapter, expenses), media_type="application/json")
 
 @router.get("/family/{family_id}", response_model=List[Expense])
 def get_family_expenses(
-    family_id: str,
+    family_id: UUIDStr,
     telegram_id: Optional[str] = Query(None, description="Telegram ID of the user"),
     db: Session = Depends(get_db)
 ):
@@ -276,33 +281,37 @@ def get_family_expenses(
     Raises:
         HTTPException: If the user doesn't have permission to view the family's expenses
     """
-    logger.info(f"Request to get expenses for family: {family_id}, requested by telegram_id: {telegram_id}")
+    logger.info("Request to get expenses for family: %s, requested by telegram_id: %s", family_id, telegram_id)
     
     # If a telegram_id is provided, verify that the user belongs to the family
     if telegram_id:
-        member = MemberService.get_member_by_telegram_id(db, telegram_id)
+        # La familia del solicitante se obtiene de la caché cuando es posible
+        member_family_id = MemberService.get_member_family_id(db, telegram_id)
         
-        if not member:
-            logger.warning(f"Member not found with telegram_id: {telegram_id}")
+        if not member_family_id:
+            logger.warning("Member not found with telegram_id: %s", telegram_id)
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Member not found"
             )
             
-        if member.family_id != family_id:
-            logger.warning(f"Permission denied for telegram_id: {telegram_id} to view expenses for family: {family_id}")
+        if member_family_id != family_id:
+            logger.warning("Permission denied for telegram_id: %s to view expenses for family: %s", telegram_id, family_id)
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You don't have permission to view this family's expenses"
             )
     
-    expenses = ExpenseService.get_expenses_by_family(db, family_id)
-    logger.info(f"Retrieved {len(expenses)} expenses for family: {family_id}")
-    return expenses
+    # Los gastos se envían por lotes a medida que se leen de la base de datos
+    logger.info("Streaming expenses for family: %s", family_id)
+    return StreamingResponse(
+        ExpenseService.stream_expenses_by_family_json(db, family_id),
+        media_type="application/json"
+    )
 
 @router.delete("/{expense_id}", response_model=Expense)
 def delete_expense(
-    expense_id: str,
+    expense_id: UUIDStr,
     telegram_id: Optional[str] = Query(None, description="Telegram ID of the user"),
     db: Session = Depends(get_db)
 ):
@@ -320,35 +329,10 @@ def delete_expense(
     Raises:
         HTTPException: If the expense is not found or the user doesn't have permission to delete it
     """
-    logger.info(f"Request to delete expense with ID: {expense_id}, requested by telegram_id: {telegram_id}")
+    logger.info("Request to delete expense with ID: %s, requested by telegram_id: %s", expense_id, telegram_id)
     
-    expense = ExpenseService.get_expense(db, expense_id)
-    if not expense:
-        logger.warning(f"Expense not found with ID: {expense_id}")
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Expense not found"
-        )
-    
-    # If a telegram_id is provided, verify that the user belongs to the same family as the payer
-    if telegram_id:
-        requesting_member = MemberService.get_member_by_telegram_id(db, telegram_id)
-        payer = MemberService.get_member(db, expense.paid_by)
-        
-        if not requesting_member or not payer:
-            logger.warning(f"Member not found. Requesting member with telegram_id: {telegram_id} or payer of expense: {expense_id}")
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Member not found"
-            )
-            
-        if requesting_member.family_id != payer.family_id:
-            logger.warning(f"Permission denied for telegram_id: {telegram_id} to delete expense: {expense_id}")
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You don't have permission to delete this expense"
-            )
+    _get_authorized_expense(db, expense_id, telegram_id, "delete")
     
     deleted_expense = ExpenseService.delete_expense(db, expense_id)
-    logger.info(f"Expense deleted successfully: {expense_id}")
-    return deleted_expense 
\ No newline at end of file
+    logger.info("Expense deleted successfully: %s", expense_id)
+    return Response(content=dump_model_json(Expense, deleted_expense), media_type="application/json")
@@ -6,13 +6,13 @@ It provides routes for creating families, retrieving family information,
 managing family members, and calculating balances.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional, Dict, Any
 import logging
 
 from app.models.database import get_db
-from app.models.schemas import Family, FamilyCreate, Member, MemberCreate, MemberBalance
+from app.models.schemas import Family, FamilyCreate, Member, MemberCreate, MemberBalance, MemberListAdapter, MemberBalanceListAdapter, dump_list_json, UUIDStr
 from app.services.family_service import FamilyService
 from app.services.member_service import MemberService
 from app.services.balance_service import BalanceService
@@ -26,6 +26,42 @@ router = APIRouter(
 
 logger = get_logger(__name__)
 
+def _family_etag(db: Session, family_id: str) -> Optional[str]:
+    """
+    Get the quoted ETag header value for the current state of a family.
+    
+    Args:
+        db (Session): Database session
+        family_id (str): ID of the family
+    
+    Returns:
+        Optional[str]: The entity tag, quoted as required by the ETag header, or
+            None if the family doesn't exist
+    """
+    etag = FamilyService.get_family_etag(db, family_id)
+    return f'"{etag}"' if etag is not None else None
+
+def _etag_matches(request: Request, etag: Optional[str]) -> bool:
+    """
+    Check whether the If-None-Match header of a request matches an entity tag.
+    
+    Args:
+        request (Request): The incoming request
+        etag (Optional[str]): The current quoted entity tag, or None if there is
+            no current representation
+    
+    Returns:
+        bool: True if the client already has the current representation
+    """
+    if_none_match = request.headers.get("if-none-match")
+    # Sin representación actual nada coincide, ni siquiera "*" (RFC 9110)
+    if not if_none_match or etag is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match usa comparación débil: se ignora el prefijo W/
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
 @router.post("/", response_model=Family, status_code=status.HTTP_201_CREATED)
 def create_family(
     family: FamilyCreate,
@@ -60,14 +96,16 @@ def create_family(
         }
         ```
     """
-    logger.info(f"Request to create family: '{family.name}' with {len(family.members)} initial members")
+    logger.info("Request to create family: '%s' with %s initial members", family.name, len(family.members))
     created_family = FamilyService.create_family(db, family)
-    logger.info(f"Family created successfully with ID: {created_family.id}, name: '{created_family.name}'")
+    logger.info("Family created successfully with ID: %s, name: '%s'", created_family.id, created_family.name)
     return created_family
 
 @router.get("/{family_id}", response_model=Family)
 def get_family(
-    family_id: str,
+    family_id: UUIDStr,
+    request: Request,
+    response: Response,
     telegram_id: Optional[str] = Query(None, description="Telegram ID of the user"),
     db: Session = Depends(get_db)
 ):
@@ -76,9 +114,13 @@ def get_family(
     
     This endpoint retrieves information about a specific family.
     If a Telegram ID is provided, it verifies that the user belongs to the family.
+    The response carries an ETag, and a request whose If-None-Match header matches
+    it gets 304 Not Modified without loading the family.
     
     Args:
         family_id (str): ID of the family to retrieve
+        request (Request): The incoming request, for the If-None-Match header
+        response (Response): The outgoing response, for the ETag header
         telegram_id (Optional[str]): Telegram ID of the requesting user for authorization
         db (Session): Database session
     
@@ -88,32 +130,46 @@ def get_family(
     Raises:
         HTTPException: If the family is not found or the user doesn't have permission
     """
-    logger.info(f"Request to get family with ID: {family_id}, requested by telegram_id: {telegram_id}")
+    logger.info("Request to get family with ID: %s, requested by telegram_id: %s", family_id, telegram_id)
     
     # If a telegram_id is provided, verify that the user belongs to the family
     if telegram_id:
-        member = MemberService.get_member_by_telegram_id(db, telegram_id)
-        if not member or member.family_id != family_id:
-            logger.warning(f"Permission denied for telegram_id: {telegram_id} to access family: {family_id}")
+        # La familia del solicitante se obtiene de la caché cuando es posible
+        requesting_family_id = MemberService.get_member_family_id(db, telegram_id)
+        if not requesting_family_id or requesting_family_id != family_id:
+            logger.warning("Permission denied for telegram_id: %s to access family: %s", telegram_id, family_id)
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You don't have permission to access this family"
             )
     
+    etag = _family_etag(db, family_id)
+    if etag is None:
+        logger.warning("Family not found with ID: %s", family_id)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Family not found"
+        )
+    if _etag_matches(request, etag):
+        logger.info("Family %s not modified, requested by telegram_id: %s", family_id, telegram_id)
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    
     family = FamilyService.get_family(db, family_id)
     if not family:
-        logger.warning(f"Family not found with ID: {family_id}")
+        logger.warning("Family not found with ID: %s", family_id)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Family not found"
         )
     
-    logger.info(f"Family retrieved successfully: {family.id}, name: '{family.name}'")
+    logger.info("Family retrieved successfully: %s, name: '%s'", family.id, family.name)
+    response.headers["ETag"] = etag
     return family
 
 @router.get("/{family_id}/members", response_model=List[Member])
 def get_family_members(
-    family_id: str,
+    family_id: UUIDStr,
+    request: Request,
     telegram_id: Optional[str] = Query(None, description="Telegram ID of the user"),
     db: Session = Depends(get_db)
 ):
@@ -122,9 +178,12 @@ def get_family_members(
     
     This endpoint retrieves all members of a specific family.
     If a Telegram ID is provided, it verifies that the user belongs to the family.
+    The response carries an ETag, and a request whose If-None-Match header matches
+    it gets 304 Not Modified without loading the members.
     
     Args:
         family_id (str): ID of the family
+        request (Request): The incoming request, for the If-None-Match header
         telegram_id (Optional[str]): Telegram ID of the requesting user for authorization
         db (Session): Database session
     
@@ -134,25 +193,36 @@ def get_family_members(
     Raises:
         HTTPException: If the user doesn't have permission to access the family
     """
-    logger.info(f"Request to get members for family ID: {family_id}, requested by telegram_id: {telegram_id}")
+    logger.info("Request to get members for family ID: %s, requested by telegram_id: %s", family_id, telegram_id)
     
     # If a telegram_id is provided, verify that the user belongs to the family
     if telegram_id:
-        member = MemberService.get_member_by_telegram_id(db, telegram_id)
-        if not member or member.family_id != family_id:
-            logger.warning(f"Permission denied for telegram_id: {telegram_id} to access family members: {family_id}")
+        # La familia del solicitante se obtiene de la caché cuando es posible
+        requesting_family_id = MemberService.get_member_family_id(db, telegram_id)
+        if not requesting_family_id or requesting_family_id != family_id:
+            logger.warning("Permission denied for telegram_id: %s to access family members: %s", telegram_id, family_id)
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You don't have permission to access this family"
             )
     
+    etag = _family_etag(db, family_id)
+    if _etag_matches(request, etag):
+        logger.info("Members of family %s not modified, requested by telegram_id: %s", family_id, telegram_id)
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    
     members = FamilyService.get_family_members(db, family_id)
-    logger.info(f"Retrieved {len(members)} members for family: {family_id}")
-    return members
+    logger.info("Retrieved %s members for family: %s", len(members), family_id)
+    # Serializar con el adaptador precompilado evita la validación de respuesta de FastAPI
+    return Response(
+        content=dump_list_json(MemberListAdapter, members),
+        media_type="application/json",
+        headers={"ETag": etag} if etag is not None else None
+    )
 
 @router.post("/{family_id}/members", response_model=Member, status_code=status.HTTP_201_CREATED)
 def add_member_to_family(
-    family_id: str,
+    family_id: UUIDStr,
     member: MemberCreate,
     telegram_id: Optional[str] = Query(None, description="Telegram ID of the user"),
     db: Session = Depends(get_db)
@@ -175,13 +245,14 @@ def add_member_to_family(
     Raises:
         HTTPException: If the user doesn't have permission or the member already belongs to a family
     """
-    logger.info(f"Request to add member: '{member.name}' with telegram_id: {member.telegram_id} to family: {family_id}")
+    logger.info("Request to add member: '%s' with telegram_id: %s to family: %s", member.name, member.telegram_id, family_id)
     
     # If a telegram_id is provided, verify that the user belongs to the family
     if telegram_id:
-        existing_member = MemberService.get_member_by_telegram_id(db, telegram_id)
-        if not existing_member or existing_member.family_id != family_id:
-            logger.warning(f"Permission denied for telegram_id: {telegram_id} to add member to family: {family_id}")
+        # La familia del solicitante se obtiene de la caché cuando es posible
+        requesting_family_id = MemberService.get_member_family_id(db, telegram_id)
+        if not requesting_family_id or requesting_family_id != family_id:
+            logger.warning("Permission denied for telegram_id: %s to add member to family: %s", telegram_id, family_id)
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You don't have permission to access this family"
@@ -191,19 +262,20 @@ def add_member_to_family(
     existing_member = MemberService.get_member_by_telegram_id(db, member.telegram_id)
     if existing_member:
         if existing_member.family_id:
-            logger.warning(f"Member with telegram_id: {member.telegram_id} already belongs to family: {existing_member.family_id}")
+            logger.warning("Member with telegram_id: %s already belongs to family: %s", member.telegram_id, existing_member.family_id)
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="This member already belongs to a family"
             )
     
     created_member = FamilyService.add_member_to_family(db, family_id, member)
-    logger.info(f"Member added successfully: {created_member.id} to family: {family_id}")
+    logger.info("Member added successfully: %s to family: %s", created_member.id, family_id)
     return created_member
 
 @router.get("/{family_id}/balances", response_model=List[MemberBalance])
 def get_family_balances(
-    family_id: str,
+    family_id: UUIDStr,
+    request: Request,
     telegram_id: Optional[str] = Query(None, description="Telegram ID of the user"),
     debug: bool = Query(False, description="Show detailed debug information"),
     db: Session = Depends(get_db)
@@ -211,8 +283,13 @@ def get_family_balances(
     """
     Get the financial balances of all members in a family.
     
+    The response carries an ETag, and a request whose If-None-Match header matches
+    it gets 304 Not Modified without recalculating the balances, unless debug is
+    set: debug requests always recalculate them to produce the debug log.
+    
     Args:
         family_id: ID of the family to get balances for
+        request: The incoming request, for the If-None-Match header
         telegram_id: Optional Telegram ID for permission validation
         debug: If True, enable detailed logging of balance calculations
         db: Database session
@@ -223,12 +300,12 @@ def get_family_balances(
     Raises:
         HTTPException: If the family is not found or the user doesn't have permission to view the balances
     """
-    logger.info(f"Request to get balances for family: {family_id}, requested by telegram_id: {telegram_id}, debug: {debug}")
+    logger.info("Request to get balances for family: %s, requested by telegram_id: %s, debug: %s", family_id, telegram_id, debug)
     
     # Check if the family exists
     family = FamilyService.get_family(db, family_id)
     if not family:
-        logger.warning(f"Family not found with ID: {family_id}")
+        logger.warning("Family not found with ID: %s", family_id)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Family not found"
@@ -236,30 +313,47 @@ def get_family_balances(
     
     # If a telegram_id is provided, verify that the user belongs to the family
     if telegram_id:
-        member = MemberService.get_member_by_telegram_id(db, telegram_id)
+        # La familia del solicitante se obtiene de la caché cuando es posible
+        requesting_family_id = MemberService.get_member_family_id(db, telegram_id)
         
-        if not member or member.family_id != family_id:
-            logger.warning(f"Permission denied for telegram_id: {telegram_id} to view balances for family: {family_id}")
+        if not requesting_family_id or requesting_family_id != family_id:
+            logger.warning("Permission denied for telegram_id: %s to view balances for family: %s", telegram_id, family_id)
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You don't have permission to view this family's balances"
             )
     
-    # Calculate the balances with debug mode if requested
-    balances = BalanceService.calculate_family_balances(db, family_id, debug_mode=debug)
-    
-    # Verificar la consistencia de los balances
-    is_consistent = BalanceService.verify_balance_consistency(db, family_id)
+    # En modo debug los balances se recalculan siempre para generar su registro
+    etag = _family_etag(db, family_id)
+    if not debug and _etag_matches(request, etag):
+        logger.info("Balances of family %s not modified, requested by telegram_id: %s", family_id, telegram_id)
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    
+    # Calculate the balances with debug mode if requested; otherwise reuse the
+    # balances cached for the current version of the family
+    if debug:
+        balances = BalanceService.calculate_family_balances(db, family_id, debug_mode=True)
+    else:
+        balances = BalanceService.get_cached_balances(db, family_id, etag)
+    
+    # Verificar la consistencia de los balances ya calculados, sin volver a consultarlos
+    is_consistent = BalanceService.verify_balance_consistency(db, family_id, balances)
     if not is_consistent:
         # Loguear el error pero no interrumpir la respuesta
-        logger.warning(f"Inconsistent balances detected for family {family_id}")
-    
-    logger.info(f"Retrieved {len(balances)} balances for family: {family_id}")
-    return balances 
+        logger.warning("Inconsistent balances detected for family %s", family_id)
+    
+    logger.info("Retrieved %s balances for family: %s", len(balances), family_id)
+    # El servicio ya devuelve modelos validados: se codifican sin volver a validarlos
+    return Response(
+        content=MemberBalanceListAdapter.dump_json(balances, by_alias=True),
+        media_type="application/json",
+        headers={"ETag": etag} if etag is not None else None
+    )
+
 
 @router.delete("/{family_id}", status_code=status.HTTP_200_OK)
 def delete_family(
-    family_id: str,
+    family_id: UUIDStr,
     telegram_id: Optional[str] = Query(None, description="Telegram ID of the user"),
     confirm: bool = Query(False, description="Confirm deletion"),
     db: Session = Depends(get_db)
@@ -286,11 +380,11 @@ def delete_family(
         HTTPException: Si la familia no se encuentra, el usuario no tiene permisos,
                        o la operación no está confirmada
     """
-    logger.info(f"Request to delete family: {family_id}, requested by telegram_id: {telegram_id}, confirm: {confirm}")
+    logger.info("Request to delete family: %s, requested by telegram_id: %s, confirm: %s", family_id, telegram_id, confirm)
     
     # Verificar que la operación está confirmada
     if not confirm:
-        logger.warning(f"Deletion not confirmed for family: {family_id}")
+        logger.warning("Deletion not confirmed for family: %s", family_id)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Esta operación es destructiva. Confirme la eliminación estableciendo confirm=true"
@@ -299,7 +393,7 @@ def delete_family(
     # Verificar que la familia existe
     family = FamilyService.get_family(db, family_id)
     if not family:
-        logger.warning(f"Family not found with ID: {family_id}")
+        logger.warning("Family not found with ID: %s", family_id)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Familia no encontrada"
@@ -307,10 +401,11 @@ def delete_family(
     
     # Si se proporciona un telegram_id, verificar que el usuario pertenece a la familia
     if telegram_id:
-        member = MemberService.get_member_by_telegram_id(db, telegram_id)
+        # La familia del solicitante se obtiene de la caché cuando es posible
+        requesting_family_id = MemberService.get_member_family_id(db, telegram_id)
         
-        if not member or member.family_id != family_id:
-            logger.warning(f"Permission denied for telegram_id: {telegram_id} to delete family: {family_id}")
+        if not requesting_family_id or requesting_family_id != family_id:
+            logger.warning("Permission denied for telegram_id: %s to delete family: %s", telegram_id, family_id)
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="No tienes permiso para eliminar esta familia"
@@ -320,11 +415,11 @@ def delete_family(
     result = FamilyService.delete_family(db, family_id)
     
     if not result["success"]:
-        logger.error(f"Error deleting family: {family_id}: {result['message']}")
+        logger.error("Error deleting family: %s: %s", family_id, result['message'])
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=result["message"]
         )
     
-    logger.info(f"Family deleted successfully: {family_id}")
+    logger.info("Family deleted successfully: %s", family_id)
     return result 
\ No newline at end of file
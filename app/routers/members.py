@@ -6,12 +6,12 @@ It provides routes for retrieving, updating, and deleting members,
 as well as getting member balances.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
 from app.models.database import get_db
-from app.models.schemas import Member, MemberCreate, MemberBalance, MemberUpdate
+from app.models.schemas import Member, MemberCreate, MemberBalance, MemberUpdate, UUIDStr
 from app.services.member_service import MemberService
 from app.services.balance_service import BalanceService
 
@@ -51,7 +51,7 @@ def get_member_by_telegram_id(
 
 @router.get("/id/{member_id}", response_model=Member)
 def get_member_by_id(
-    member_id: str,
+    member_id: UUIDStr,
     telegram_id: Optional[str] = Query(None, description="Telegram ID of the user"),
     db: Session = Depends(get_db)
 ):
@@ -81,8 +81,9 @@ def get_member_by_id(
     
     # If a telegram_id is provided, verify that the user belongs to the same family
     if telegram_id:
-        requesting_member = MemberService.get_member_by_telegram_id(db, telegram_id)
-        if not requesting_member or requesting_member.family_id != member.family_id:
+        # La familia del solicitante se obtiene de la caché cuando es posible
+        requesting_family_id = MemberService.get_member_family_id(db, telegram_id)
+        if not requesting_family_id or requesting_family_id != member.family_id:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You don't have permission to access this member"
@@ -128,7 +129,7 @@ def get_current_member_balance(
 
 @router.put("/{member_id}", response_model=Member)
 def update_member(
-    member_id: str,
+    member_id: UUIDStr,
     member: MemberUpdate,
     telegram_id: Optional[str] = Query(None, description="Telegram ID of the user"),
     db: Session = Depends(get_db)
@@ -171,7 +172,7 @@ def update_member(
 
 @router.delete("/{member_id}", response_model=Member)
 def delete_member(
-    member_id: str,
+    member_id: UUIDStr,
     telegram_id: Optional[str] = Query(None, description="Telegram ID of the user"),
     db: Session = Depends(get_db)
 ):
@@ -201,8 +202,9 @@ def delete_member(
     
     # If a telegram_id is provided, verify that the user belongs to the same family
     if telegram_id:
-        requesting_member = MemberService.get_member_by_telegram_id(db, telegram_id)
-        if not requesting_member or requesting_member.family_id != db_member.family_id:
+        # La familia del solicitante se obtiene de la caché cuando es posible
+        requesting_family_id = MemberService.get_member_family_id(db, telegram_id)
+        if not requesting_family_id or requesting_family_id != db_member.family_id:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You don't have permission to delete this member"
@@ -212,7 +214,7 @@ def delete_member(
 
 @router.get("/balance/{member_id}", response_model=MemberBalance)
 def get_member_balance(
-    member_id: str,
+    member_id: UUIDStr,
     telegram_id: Optional[str] = Query(None, description="Telegram ID of the user"),
     db: Session = Depends(get_db)
 ):
@@ -242,30 +244,23 @@ def get_member_balance(
     
     # If a telegram_id is provided, verify that the user belongs to the same family
     if telegram_id:
-        requesting_member = MemberService.get_member_by_telegram_id(db, telegram_id)
+        # La familia del solicitante se obtiene de la caché cuando es posible
+        requesting_family_id = MemberService.get_member_family_id(db, telegram_id)
         
-        if not requesting_member or requesting_member.family_id != member.family_id:
+        if not requesting_family_id or requesting_family_id != member.family_id:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You don't have permission to view this member's balance"
             )
     
-    # Get the member's balance
+    # Get the member's balance (shared with the balance cache, so it isn't modified)
     balance = BalanceService.get_member_balance(db, member.family_id, member_id)
     
-    # Mejorar la visualización de los balances
-    if not balance.debts:
-        # Si el miembro no tiene deudas, añadir un mensaje
-        balance.debts = []  # Asegurar que sea una lista vacía
-    
-    if not balance.credits:
-        # Si nadie le debe al miembro, añadir un mensaje
-        balance.credits = []  # Asegurar que sea una lista vacía
-    
     if not balance:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Balance not found"
         )
     
-    return balance 
\ No newline at end of file
+    # El servicio ya devuelve un modelo validado: se codifica sin volver a validarlo
+    return Response(content=balance.model_dump_json(by_alias=True), media_type="application/json")
@@ -6,13 +6,14 @@ It provides routes for creating, retrieving, and deleting payments,
 as well as getting payments by member or family.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional, Dict, Tuple, Any
 import logging
 
 from app.models.database import get_db
-from app.models.schemas import Payment, PaymentCreate, PaymentUpdate, PaymentStatus
+from app.models.schemas import Payment, PaymentCreate, PaymentUpdate, PaymentStatus, PaymentListAdapter, dump_list_json, UUIDStr
 from app.services.payment_service import PaymentService
 from app.services.member_service import MemberService
 from app.services.balance_service import BalanceService
@@ -50,16 +51,13 @@ def create_payment(
         HTTPException: If the user doesn't have permission to create payments for these members,
                      if the payment amount exceeds the debt, or if there is no debt in that direction
     """
-    logger.info(f"Request to create payment: from {payment.from_member} to {payment.to_member}, amount: {payment.amount}")
+    logger.info("Request to create payment: from %s to %s, amount: %s", payment.from_member, payment.to_member, payment.amount)
     
     # If a telegram_id is provided, verify that the user belongs to the same family as the payment members
     if telegram_id:
-        requesting_member = MemberService.get_member_by_telegram_id(db, telegram_id)
-        from_member = MemberService.get_member(db, payment.from_member)
-        to_member = MemberService.get_member(db, payment.to_member)
-        
-        if not requesting_member or not from_member or not to_member or requesting_member.family_id != from_member.family_id or from_member.family_id != to_member.family_id:
-            logger.warning(f"Permission denied for telegram_id: {telegram_id} to create payment for members: {payment.from_member}, {payment.to_member}")
+        # Solicitante, emisor y receptor se comprueban en una sola consulta
+        if not MemberService.verify_payment_family(db, telegram_id, payment.from_member, payment.to_member):
+            logger.warning("Permission denied for telegram_id: %s to create payment for members: %s, %s", telegram_id, payment.from_member, payment.to_member)
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="No tienes permiso para crear pagos entre estos miembros"
@@ -68,14 +66,14 @@ def create_payment(
     try:
         # Intentar crear el pago - aquí se validará si el monto excede la deuda
         created_payment = PaymentService.create_payment(db, payment)
-        logger.info(f"Payment created successfully with ID: {created_payment.id}")
+        logger.info("Payment created successfully with ID: %s", created_payment.id)
         return created_payment
     except HTTPException as e:
         # Reenviar la excepción HTTP sin modificarla
         raise
     except Exception as e:
         # Para otros errores, enviar un mensaje genérico
-        logger.error(f"Error al procesar el pago: {str(e)}")
+        logger.error("Error al procesar el pago: %s", str(e))
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error al procesar el pago: {str(e)}"
@@ -83,7 +81,7 @@ def create_payment(
 
 @router.get("/{payment_id}", response_model=Payment)
 def get_payment(
-    payment_id: str,
+    payment_id: UUIDStr,
     telegram_id: Optional[str] = Query(None, description="Telegram ID of the user"),
     db: Session = Depends(get_db)
 ):
@@ -101,11 +99,11 @@ def get_payment(
     Raises:
         HTTPException: If the payment is not found or the user doesn't have permission to view it
     """
-    logger.info(f"Request to get payment with ID: {payment_id}, requested by telegram_id: {telegram_id}")
+    logger.info("Request to get payment with ID: %s, requested by telegram_id: %s", payment_id, telegram_id)
     
     payment = PaymentService.get_payment(db, payment_id)
     if not payment:
-        logger.warning(f"Payment not found with ID: {payment_id}")
+        logger.warning("Payment not found with ID: %s", payment_id)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Payment not found"
@@ -113,23 +111,22 @@ def get_payment(
     
     # If a telegram_id is provided, verify that the user belongs to the same family as the payment members
     if telegram_id:
-        requesting_member = MemberService.get_member_by_telegram_id(db, telegram_id)
-        from_member = MemberService.get_member(db, payment.from_member)
-        to_member = MemberService.get_member(db, payment.to_member)
+        # La familia del pago ya está cargada y la del solicitante se obtiene de la caché cuando es posible
+        requesting_family_id = MemberService.get_member_family_id(db, telegram_id)
         
-        if not requesting_member or not from_member or not to_member or requesting_member.family_id != from_member.family_id:
-            logger.warning(f"Permission denied for telegram_id: {telegram_id} to view payment: {payment_id}")
+        if not requesting_family_id or requesting_family_id != payment.family_id:
+            logger.warning("Permission denied for telegram_id: %s to view payment: %s", telegram_id, payment_id)
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You don't have permission to view this payment"
             )
     
-    logger.info(f"Payment retrieved successfully: {payment.id}")
+    logger.info("Payment retrieved successfully: %s", payment.id)
     return payment
 
 @router.get("/member/{member_id}", response_model=List[Payment])
 def get_member_payments(
-    member_id: int,
+    member_id: UUIDStr,
     telegram_id: Optional[str] = Query(None, description="Telegram ID of the user"),
     db: Session = Depends(get_db)
 ):
@@ -147,11 +144,11 @@ def get_member_payments(
     Raises:
         HTTPException: If the member is not found or the user doesn't have permission to view the payments
     """
-    logger.info(f"Request to get payments for member: {member_id}, requested by telegram_id: {telegram_id}")
+    logger.info("Request to get payments for member: %s, requested by telegram_id: %s", member_id, telegram_id)
     
     member = MemberService.get_member(db, member_id)
     if not member:
-        logger.warning(f"Member not found with ID: {member_id}")
+        logger.warning("Member not found with ID: %s", member_id)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Member not found"
@@ -159,22 +156,24 @@ def get_member_payments(
     
     # If a telegram_id is provided, verify that the user belongs to the same family
     if telegram_id:
-        requesting_member = MemberService.get_member_by_telegram_id(db, telegram_id)
+        # La familia del solicitante se obtiene de la caché cuando es posible
+        requesting_family_id = MemberService.get_member_family_id(db, telegram_id)
         
-        if not requesting_member or requesting_member.family_id != member.family_id:
-            logger.warning(f"Permission denied for telegram_id: {telegram_id} to view payments for member: {member_id}")
+        if not requesting_family_id or requesting_family_id != member.family_id:
+            logger.warning("Permission denied for telegram_id: %s to view payments for member: %s", telegram_id, member_id)
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You don't have permission to view this member's payments"
             )
     
     payments = PaymentService.get_payments_by_member(db, member_id)
-    logger.info(f"Retrieved {len(payments)} payments for member: {member_id}")
-    return payments
+    logger.info("Retrieved %s payments for member: %s", len(payments), member_id)
+    # Serializar con el adaptador precompilado evita la validación de respuesta de FastAPI
+    return Response(content=dump_list_json(PaymentListAdapter, payments), media_type="application/json")
 
 @router.get("/family/{family_id}", response_model=List[Payment])
 def get_family_payments(
-    family_id: str,
+    family_id: UUIDStr,
     telegram_id: Optional[str] = Query(None, description="Telegram ID of the user"),
     db: Session = Depends(get_db)
 ):
@@ -192,26 +191,30 @@ def get_family_payments(
     Raises:
         HTTPException: If the user doesn't have permission to view the family's payments
     """
-    logger.info(f"Request to get payments for family: {family_id}, requested by telegram_id: {telegram_id}")
+    logger.info("Request to get payments for family: %s, requested by telegram_id: %s", family_id, telegram_id)
     
     # If a telegram_id is provided, verify that the user belongs to the family
     if telegram_id:
-        member = MemberService.get_member_by_telegram_id(db, telegram_id)
+        # La familia del solicitante se obtiene de la caché cuando es posible
+        requesting_family_id = MemberService.get_member_family_id(db, telegram_id)
         
-        if not member or member.family_id != family_id:
-            logger.warning(f"Permission denied for telegram_id: {telegram_id} to view payments for family: {family_id}")
+        if not requesting_family_id or requesting_family_id != family_id:
+            logger.warning("Permission denied for telegram_id: %s to view payments for family: %s", telegram_id, family_id)
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You don't have permission to view this family's payments"
             )
     
-    payments = PaymentService.get_payments_by_family(db, family_id)
-    logger.info(f"Retrieved {len(payments)} payments for family: {family_id}")
-    return payments
+    # El historial de pagos se envía por lotes a medida que se lee de la base de datos
+    logger.info("Streaming payments for family: %s", family_id)
+    return StreamingResponse(
+        PaymentService.stream_payments_by_family_json(db, family_id),
+        media_type="application/json"
+    )
 
 @router.delete("/{payment_id}", response_model=Dict[str, Any])
 def delete_payment(
-    payment_id: str,
+    payment_id: UUIDStr,
     telegram_id: Optional[str] = Query(None, description="Telegram ID of the user"),
     db: Session = Depends(get_db)
 ):
@@ -229,12 +232,12 @@ def delete_payment(
     Raises:
         HTTPException: If the payment is not found or the user doesn't have permission to delete it
     """
-    logger.info(f"Request to delete payment with ID: {payment_id}, requested by telegram_id: {telegram_id}")
+    logger.info("Request to delete payment with ID: %s, requested by telegram_id: %s", payment_id, telegram_id)
     
     # We fetch the payment first mainly for permission checks
     payment = PaymentService.get_payment(db, payment_id)
     if not payment:
-        logger.warning(f"Payment not found with ID: {payment_id}")
+        logger.warning("Payment not found with ID: %s", payment_id)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Payment not found"
@@ -242,12 +245,13 @@ def delete_payment(
     
     # If a telegram_id is provided, verify that the user belongs to the same family as the payment members
     if telegram_id:
-        requesting_member = MemberService.get_member_by_telegram_id(db, telegram_id)
+        # La familia del solicitante se obtiene de la caché cuando es posible
+        requesting_family_id = MemberService.get_member_family_id(db, telegram_id)
         # Need to ensure related members are loaded for permission check
         # This get_payment call might not load them eagerly, consider modifying if needed.
         # For now, assuming the loaded payment object has IDs accessible.
-        if not requesting_member or not payment.family_id or requesting_member.family_id != payment.family_id:
-            logger.warning(f"Permission denied for telegram_id: {telegram_id} to delete payment: {payment_id}")
+        if not requesting_family_id or not payment.family_id or requesting_family_id != payment.family_id:
+            logger.warning("Permission denied for telegram_id: %s to delete payment: %s", telegram_id, payment_id)
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You don't have permission to delete this payment"
@@ -257,7 +261,7 @@ def delete_payment(
     deleted_payment_data = PaymentService.delete_payment(db, payment_id)
     
     if deleted_payment_data:
-        logger.info(f"Payment deleted successfully: {payment_id}")
+        logger.info("Payment deleted successfully: %s", payment_id)
         return {"status": "success", "message": "Payment deleted successfully", "deleted_payment": deleted_payment_data}
     else:
         # This case might not be reachable if get_payment already checked
@@ -268,7 +272,7 @@ def delete_payment(
 
 @router.get("/diagnostics/{family_id}", response_model=Dict[str, Any])
 def diagnose_payment_issues(
-    family_id: str,
+    family_id: UUIDStr,
     telegram_id: Optional[str] = Query(None, description="Telegram ID of the user"),
     db: Session = Depends(get_db)
 ):
@@ -286,14 +290,15 @@ def diagnose_payment_issues(
             - possible_duplicates: Lista de posibles pagos duplicados
             - consistency_check: Si los balances son consistentes (suman cero)
     """
-    logger.info(f"Request to diagnose payments for family: {family_id}, requested by telegram_id: {telegram_id}")
+    logger.info("Request to diagnose payments for family: %s, requested by telegram_id: %s", family_id, telegram_id)
     
     # Si se proporciona un telegram_id, verificar que el usuario pertenece a la familia
     if telegram_id:
-        requesting_member = MemberService.get_member_by_telegram_id(db, telegram_id)
+        # La familia del solicitante se obtiene de la caché cuando es posible
+        requesting_family_id = MemberService.get_member_family_id(db, telegram_id)
         
-        if not requesting_member or requesting_member.family_id != family_id:
-            logger.warning(f"Permission denied for telegram_id: {telegram_id} to diagnose payments for family: {family_id}")
+        if not requesting_family_id or requesting_family_id != family_id:
+            logger.warning("Permission denied for telegram_id: %s to diagnose payments for family: %s", telegram_id, family_id)
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="No tienes permiso para diagnosticar los pagos de esta familia"
@@ -305,7 +310,7 @@ def diagnose_payment_issues(
     # Verificar consistencia de balances
     consistency_check = BalanceService.verify_balance_consistency(db, family_id)
     
-    logger.info(f"Retrieved {len(all_payments)} payments for family: {family_id}")
+    logger.info("Retrieved %s payments for family: %s", len(all_payments), family_id)
     return {
         "all_payments": all_payments,
         "possible_duplicates": duplicate_analysis,
@@ -315,7 +320,7 @@ def diagnose_payment_issues(
 
 @router.post("/fix-duplicates/{family_id}", response_model=Dict[str, Any])
 def fix_payment_duplicates(
-    family_id: str,
+    family_id: UUIDStr,
     telegram_id: Optional[str] = Query(None, description="Telegram ID of the user"),
     db: Session = Depends(get_db)
 ):
@@ -333,14 +338,15 @@ def fix_payment_duplicates(
     Returns:
         Dict: Información sobre las correcciones realizadas
     """
-    logger.info(f"Request to fix payment duplicates for family: {family_id}, requested by telegram_id: {telegram_id}")
+    logger.info("Request to fix payment duplicates for family: %s, requested by telegram_id: %s", family_id, telegram_id)
     
     # Si se proporciona un telegram_id, verificar que el usuario pertenece a la familia
     if telegram_id:
-        requesting_member = MemberService.get_member_by_telegram_id(db, telegram_id)
+        # La familia del solicitante se obtiene de la caché cuando es posible
+        requesting_family_id = MemberService.get_member_family_id(db, telegram_id)
         
-        if not requesting_member or requesting_member.family_id != family_id:
-            logger.warning(f"Permission denied for telegram_id: {telegram_id} to fix payment duplicates for family: {family_id}")
+        if not requesting_family_id or requesting_family_id != family_id:
+            logger.warning("Permission denied for telegram_id: %s to fix payment duplicates for family: %s", telegram_id, family_id)
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="No tienes permiso para corregir los pagos de esta familia"
@@ -351,7 +357,7 @@ def fix_payment_duplicates(
     
     # Si no hay duplicados, informar
     if not duplicate_analysis:
-        logger.info(f"No se encontraron pagos duplicados para corregir en family: {family_id}")
+        logger.info("No se encontraron pagos duplicados para corregir en family: %s", family_id)
         return {
             "status": "No se encontraron pagos duplicados para corregir",
             "payments_deleted": []
@@ -390,7 +396,7 @@ def fix_payment_duplicates(
                     "amount": deleted_payment.amount
                 })
     
-    logger.info(f"Se eliminaron {len(deleted_payments)} pagos duplicados en family: {family_id}")
+    logger.info("Se eliminaron %s pagos duplicados en family: %s", len(deleted_payments), family_id)
     return {
         "status": f"Se eliminaron {len(deleted_payments)} pagos duplicados",
         "payments_deleted": deleted_payments
@@ -398,7 +404,7 @@ def fix_payment_duplicates(
 
 @router.patch("/{payment_id}/status", response_model=Payment)
 def update_payment_status(
-    payment_id: str,
+    payment_id: UUIDStr,
     payment_update: PaymentUpdate,
     telegram_id: Optional[str] = Query(None, description="Telegram ID of the user"),
     db: Session = Depends(get_db)
@@ -427,12 +433,12 @@ def update_payment_status(
     Raises:
         HTTPException: If the payment is not found or the user doesn't have permission
     """
-    logger.info(f"Request to update payment with ID: {payment_id}, new status: {payment_update.status}, requested by telegram_id: {telegram_id}")
+    logger.info("Request to update payment with ID: %s, new status: %s, requested by telegram_id: %s", payment_id, payment_update.status, telegram_id)
     
     # Verificar que el pago existe
     payment = PaymentService.get_payment(db, payment_id)
     if not payment:
-        logger.warning(f"Payment not found with ID: {payment_id}")
+        logger.warning("Payment not found with ID: %s", payment_id)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Pago no encontrado"
@@ -440,9 +446,10 @@ def update_payment_status(
     
     # Si se proporciona un telegram_id, verificar permisos
     if telegram_id:
-        requesting_member = MemberService.get_member_by_telegram_id(db, telegram_id)
-        if not requesting_member or requesting_member.family_id != payment.family_id:
-            logger.warning(f"Permission denied for telegram_id: {telegram_id} to update payment: {payment_id}")
+        # La familia del solicitante se obtiene de la caché cuando es posible
+        requesting_family_id = MemberService.get_member_family_id(db, telegram_id)
+        if not requesting_family_id or requesting_family_id != payment.family_id:
+            logger.warning("Permission denied for telegram_id: %s to update payment: %s", telegram_id, payment_id)
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="No tienes permiso para actualizar este pago"
@@ -450,12 +457,12 @@ def update_payment_status(
     
     # Actualizar el estado del pago
     updated_payment = PaymentService.update_payment_status(db, payment_id, payment_update)
-    logger.info(f"Payment updated successfully: {payment_id}, new status: {payment_update.status}")
+    logger.info("Payment updated successfully: %s, new status: %s", payment_id, payment_update.status)
     return updated_payment
 
 @router.post("/{payment_id}/confirm", response_model=Payment)
 def confirm_payment(
-    payment_id: str,
+    payment_id: UUIDStr,
     telegram_id: Optional[str] = Query(None, description="Telegram ID of the user"),
     db: Session = Depends(get_db)
 ):
@@ -478,12 +485,12 @@ def confirm_payment(
         HTTPException: If the payment is not found, not in PENDING status,
                       or the user doesn't have permission
     """
-    logger.info(f"Request to confirm payment with ID: {payment_id}, requested by telegram_id: {telegram_id}")
+    logger.info("Request to confirm payment with ID: %s, requested by telegram_id: %s", payment_id, telegram_id)
     
     # Verificar que el pago existe
     payment = PaymentService.get_payment(db, payment_id)
     if not payment:
-        logger.warning(f"Payment not found with ID: {payment_id}")
+        logger.warning("Payment not found with ID: %s", payment_id)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Pago no encontrado"
@@ -494,7 +501,7 @@ def confirm_payment(
     if telegram_id:
         requesting_member = MemberService.get_member_by_telegram_id(db, telegram_id)
         if not requesting_member:
-            logger.warning(f"Requesting member not found with telegram_id: {telegram_id}")
+            logger.warning("Requesting member not found with telegram_id: %s", telegram_id)
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Usuario no encontrado"
@@ -502,7 +509,7 @@ def confirm_payment(
         
         # Verificar que es el receptor del pago o un miembro de la misma familia
         if requesting_member.id != payment.to_member_id and requesting_member.family_id != payment.family_id:
-            logger.warning(f"Permission denied for telegram_id: {telegram_id} to confirm payment: {payment_id}")
+            logger.warning("Permission denied for telegram_id: %s to confirm payment: %s", telegram_id, payment_id)
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="No tienes permiso para confirmar este pago"
@@ -510,12 +517,12 @@ def confirm_payment(
     
     # Confirmar el pago
     confirmed_payment = PaymentService.confirm_payment(db, payment_id)
-    logger.info(f"Payment confirmed successfully: {payment_id}")
+    logger.info("Payment confirmed successfully: %s", payment_id)
     return confirmed_payment
 
 @router.post("/{payment_id}/reject", response_model=Payment)
 def reject_payment(
-    payment_id: str,
+    payment_id: UUIDStr,
     telegram_id: Optional[str] = Query(None, description="Telegram ID of the user"),
     db: Session = Depends(get_db)
 ):
@@ -538,12 +545,12 @@ def reject_payment(
         HTTPException: If the payment is not found, not in PENDING status,
                       or the user doesn't have permission
     """
-    logger.info(f"Request to reject payment with ID: {payment_id}, requested by telegram_id: {telegram_id}")
+    logger.info("Request to reject payment with ID: %s, requested by telegram_id: %s", payment_id, telegram_id)
     
     # Verificar que el pago existe
     payment = PaymentService.get_payment(db, payment_id)
     if not payment:
-        logger.warning(f"Payment not found with ID: {payment_id}")
+        logger.warning("Payment not found with ID: %s", payment_id)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Pago no encontrado"
@@ -554,7 +561,7 @@ def reject_payment(
     if telegram_id:
         requesting_member = MemberService.get_member_by_telegram_id(db, telegram_id)
         if not requesting_member:
-            logger.warning(f"Requesting member not found with telegram_id: {telegram_id}")
+            logger.warning("Requesting member not found with telegram_id: %s", telegram_id)
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Usuario no encontrado"
@@ -564,7 +571,7 @@ def reject_payment(
         if (requesting_member.id != payment.to_member_id and 
             requesting_member.id != payment.from_member_id and 
             requesting_member.family_id != payment.family_id):
-            logger.warning(f"Permission denied for telegram_id: {telegram_id} to reject payment: {payment_id}")
+            logger.warning("Permission denied for telegram_id: %s to reject payment: %s", telegram_id, payment_id)
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="No tienes permiso para rechazar este pago"
@@ -572,5 +579,5 @@ def reject_payment(
     
     # Rechazar el pago
     rejected_payment = PaymentService.reject_payment(db, payment_id)
-    logger.info(f"Payment rejected successfully: {payment_id}")
+    logger.info("Payment rejected successfully: %s", payment_id)
     return rejected_payment 
\ No newline at end of file
@@ -0,0 +1,34 @@
+"""
+Script de inicialización de la base de datos
+
+Este script crea las tablas definidas en los modelos si todavía no existen.
+Debe ejecutarse una sola vez por despliegue (por ejemplo, en la fase de release),
+en lugar de hacerlo cada vez que un worker de la API importa la aplicación.
+
+Uso:
+    python -m app.scripts.init_db
+"""
+
+import sys
+
+from app.models.database import engine, Base
+# Importar los modelos para registrarlos en los metadatos de Base
+from app.models import models  # noqa: F401
+
+def init_db():
+    """
+    Crea todas las tablas que no existan en la base de datos.
+    
+    Returns:
+        bool: True si la inicialización fue exitosa, False en caso contrario
+    """
+    try:
+        Base.metadata.create_all(bind=engine)
+        print("✅ Tablas de la base de datos verificadas/creadas correctamente")
+        return True
+    except Exception as e:
+        print(f"❌ Error al inicializar la base de datos: {str(e)}")
+        return False
+
+if __name__ == "__main__":
+    sys.exit(0 if init_db() else 1)
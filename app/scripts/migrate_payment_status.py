@@ -10,9 +10,8 @@ Utiliza la conexión directa a PostgreSQL para realizar la migración.
 
 import sys
 import os
-from sqlalchemy import create_engine, text, Column, Enum
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, Session
-import enum
 from dotenv import load_dotenv
 
 # Cargar variables de entorno
@@ -26,20 +25,6 @@ if not DATABASE_URL:
 engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-# Definir el enum PaymentStatus para verificación
-class PaymentStatus(enum.Enum):
-    """
-    Enum para los valores de estado de pago.
-    
-    Attributes:
-        PENDING: Pago creado pero no confirmado por el receptor
-        CONFIRM: Pago confirmado por el receptor
-        INACTIVE: Pago rechazado o cancelado
-    """
-    PENDING = "PENDING"
-    CONFIRM = "CONFIRM"
-    INACTIVE = "INACTIVE"
-
 def get_db():
     """Obtener una sesión de base de datos para la migración."""
     db = SessionLocal()
@@ -96,7 +81,6 @@ def create_enum_type(db):
         db.execute(text("""
             CREATE TYPE paymentstatus AS ENUM ('PENDING', 'CONFIRM', 'INACTIVE')
         """))
-        db.commit()
         return True
     else:
         print("El tipo enum 'paymentstatus' ya existe")
@@ -123,8 +107,6 @@ def add_status_column(db):
         db.execute(text("""
             ALTER TABLE payments ADD COLUMN status paymentstatus DEFAULT 'CONFIRM'::paymentstatus
         """))
-        
-        db.commit()
         print("Columna 'status' añadida exitosamente")
         return True
     else:
@@ -146,7 +128,6 @@ def update_existing_payments(db):
         UPDATE payments SET status = 'CONFIRM'::paymentstatus 
         WHERE status IS NULL
     """))
-    db.commit()
     
     # Obtener el número de filas afectadas (puede no funcionar en todas las implementaciones)
     rows_affected = getattr(result, 'rowcount', None)
@@ -164,6 +145,9 @@ def migrate_payment_status():
     2. Añade la columna status si no existe
     3. Actualiza todos los pagos existentes sin estado
     
+    Todos los pasos se ejecutan en una única transacción, de modo que la
+    migración se aplica completa o no se aplica.
+    
     Returns:
         bool: True si la migración fue exitosa
     """
@@ -171,6 +155,9 @@ def migrate_payment_status():
     
     db = next(get_db())
     try:
+        # Migración offline: no esperar al fsync del WAL en el commit
+        db.execute(text("SET LOCAL synchronous_commit = OFF"))
+        
         # Paso 1: Crear/verificar el enum
         enum_created = create_enum_type(db)
         
@@ -180,6 +167,9 @@ def migrate_payment_status():
         # Paso 3: Actualizar los pagos existentes
         rows_updated = update_existing_payments(db)
         
+        # Confirmar todos los pasos a la vez
+        db.commit()
+        
         print("\n✅ Migración completada exitosamente")
         print(f"  - Enum creado: {'Sí' if enum_created else 'No (ya existía)'}")
         print(f"  - Columna añadida: {'Sí' if column_added else 'No (ya existía)'}")
@@ -1,13 +1,22 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_
-from app.models.models import Family, Member, Expense, Payment, PaymentStatus
-from app.models.schemas import MemberBalance, DebtDetail, CreditDetail
-from typing import List, Dict, Set, Tuple
+from cachetools import LRUCache
+import threading
+from app.models.models import Family, Member, Expense, ExpenseShare, Payment, PaymentStatus
+from app.models.schemas import MemberBalance, MemberBalanceListAdapter
+from app.services.family_service import FamilyService
+from typing import List, Dict, Optional, Set, Tuple
 from app.utils.logging_config import get_logger
 
 # Configurar logging centralizado
 logger = get_logger("balance_service")
 
+# Balances already calculated, keyed by (family ID, family ETag). The ETag changes
+# with any write to the family's members, expenses or payments, so an entry is
+# never stale: outdated versions are simply evicted as new ones are added
+_balances_cache = LRUCache(maxsize=512)
+_balances_cache_lock = threading.Lock()
+
 class BalanceService:
     """
     Service for calculating family balances.
@@ -62,63 +71,55 @@ class BalanceService:
                 logger.info(f"Initialized balance for {member.name} (ID: {member_id})")
         
         # Process expenses
-        expenses = db.query(Expense).filter(Expense.paid_by.in_(member_ids)).all()
+        # Cada fila de la asociación guarda la parte del gasto de cada miembro, así
+        # que las deudas entre pagador y miembro salen de una única agregación
+        share_totals = db.query(
+            Expense.paid_by,
+            ExpenseShare.member_id,
+            func.sum(ExpenseShare.amount_share)
+        ).join(
+            ExpenseShare, ExpenseShare.expense_id == Expense.id
+        ).filter(
+            Expense.paid_by.in_(member_ids),
+            # If the member is the payer, they don't owe themselves
+            ExpenseShare.member_id != Expense.paid_by
+        ).group_by(
+            Expense.paid_by,
+            ExpenseShare.member_id
+        ).all()
+        
         if debug_mode:
-            logger.info(f"Found {len(expenses)} expenses to process")
+            logger.info(f"Found {len(share_totals)} payer/member expense totals to process")
         
-        for expense in expenses:
-            # Get the member who paid
-            payer_id = str(expense.paid_by)
+        for paid_by, share_member_id, amount in share_totals:
+            payer_id = str(paid_by)
+            member_id = str(share_member_id)
             
-            # Get the members among whom the expense is split
-            split_members = expense.split_among
+            # Ignore shares of members that no longer belong to the family
+            if member_id not in balances:
+                continue
             
-            # If no specific members, split among all
-            if not split_members:
-                split_members = members
+            # Update the debt amount
+            balances[member_id]["debts_by_member"][payer_id] = amount
+            balances[payer_id]["credits_by_member"][member_id] = amount
             
-            # Calculate the amount per member
-            amount_per_member = expense.amount / len(split_members)
+            # Update totals
+            balances[member_id]["total_debt"] += amount
+            balances[payer_id]["total_owed"] += amount
             
             if debug_mode:
-                payer_name = members_by_id[payer_id].name if payer_id in members_by_id else "Unknown"
-                logger.info(f"Processing expense: {expense.description}, ${expense.amount:.2f}, paid by {payer_name}")
-                logger.info(f"Split among {len(split_members)} members, ${amount_per_member:.2f} per member")
-            
-            # Update the balances
-            for member in split_members:
-                member_id = str(member.id)
-                
-                # If the member is the payer, they don't owe themselves
-                if member_id == payer_id:
-                    if debug_mode:
-                        logger.info(f"  - {members_by_id[member_id].name} is the payer, skipping self-debt")
-                    continue
-                
-                # Initialize the debt tracking for this pair if needed
-                if payer_id not in balances[member_id]["debts_by_member"]:
-                    balances[member_id]["debts_by_member"][payer_id] = 0.0
-                
-                if member_id not in balances[payer_id]["credits_by_member"]:
-                    balances[payer_id]["credits_by_member"][member_id] = 0.0
-                
-                # Update the debt amount
-                balances[member_id]["debts_by_member"][payer_id] += amount_per_member
-                balances[payer_id]["credits_by_member"][member_id] += amount_per_member
-                
-                # Update totals
-                balances[member_id]["total_debt"] += amount_per_member
-                balances[payer_id]["total_owed"] += amount_per_member
-                
-                if debug_mode:
-                    logger.info(f"  - {members_by_id[member_id].name} now owes ${balances[member_id]['debts_by_member'][payer_id]:.2f} to {members_by_id[payer_id].name}")
-                    logger.info(f"  - {members_by_id[member_id].name} total debt: ${balances[member_id]['total_debt']:.2f}")
-                    logger.info(f"  - {members_by_id[payer_id].name} total owed: ${balances[payer_id]['total_owed']:.2f}")
+                logger.info(f"  - {members_by_id[member_id].name} owes ${amount:.2f} to {members_by_id[payer_id].name} for expenses")
         
         # Process payments
         # CORRECCIÓN: Asegurar que los pagos no se procesen por duplicado
         # Obtener todos los pagos confirmados de la familia
-        all_payments = db.query(Payment).filter(
+        # Solo se leen las columnas cubiertas por ix_payments_family_id_confirmed
+        all_payments = db.query(
+            Payment.id,
+            Payment.from_member_id,
+            Payment.to_member_id,
+            Payment.amount
+        ).filter(
             and_(
                 Payment.family_id == family_id,
                 Payment.status == PaymentStatus.CONFIRM
@@ -308,20 +309,45 @@ class BalanceService:
                 logger.warning(f"Warning: Total net balance is not zero (${total_net_balance:.2f})")
         
         # Convert to a list of MemberBalance objects
-        result = []
-        for member_id, balance_data in balances.items():
-            member_balance = MemberBalance(
-                member_id=balance_data["member_id"],
-                name=balance_data["name"],
-                total_debt=balance_data["total_debt"],
-                total_owed=balance_data["total_owed"],
-                net_balance=balance_data["net_balance"],
-                debts=[DebtDetail(**debt) for debt in balance_data["debts"]],
-                credits=[CreditDetail(**credit) for credit in balance_data["credits"]]
-            )
-            result.append(member_balance)
+        # Todos los balances, con sus deudas y créditos anidados, se validan en una
+        # sola llamada en lugar de construir cada DebtDetail/CreditDetail por separado
+        return MemberBalanceListAdapter.validate_python(list(balances.values()))
+    
+    @staticmethod
+    def get_cached_balances(db: Session, family_id: str, version: Optional[str] = None) -> List[MemberBalance]:
+        """
+        Get the balances of a family, reusing them while the family doesn't change.
         
-        return result
+        The balances are cached by family and version, so writes don't need to
+        invalidate the cache: a new expense, payment or member change gives the
+        family a new version and the balances are calculated again.
+        
+        Args:
+            db: Database session
+            family_id: ID of the family to get balances for
+            version: ETag of the family already obtained by the caller; if omitted
+                it is queried with FamilyService.get_family_etag (balances of a
+                family that doesn't exist are not cached)
+            
+        Returns:
+            List[MemberBalance]: List of member balances (frozen, shared between requests)
+        """
+        if version is None:
+            version = FamilyService.get_family_etag(db, family_id)
+            if version is None:
+                # La familia no existe: no hay una versión con la que cachear
+                return BalanceService.calculate_family_balances(db, family_id)
+        key = (family_id, version)
+        
+        with _balances_cache_lock:
+            balances = _balances_cache.get(key)
+        if balances is not None:
+            return balances
+        
+        balances = BalanceService.calculate_family_balances(db, family_id)
+        with _balances_cache_lock:
+            _balances_cache[key] = balances
+        return balances
     
     @staticmethod
     def get_member_balance(db: Session, family_id: str, member_id: str) -> MemberBalance:
@@ -336,8 +362,8 @@ class BalanceService:
         Returns:
             MemberBalance: The member's balance or None if not found
         """
-        # Calculate the balances of the entire family
-        family_balances = BalanceService.calculate_family_balances(db, family_id)
+        # Get the balances of the entire family (cached while the family doesn't change)
+        family_balances = BalanceService.get_cached_balances(db, family_id)
         
         # Find the balance of the specific member
         for balance in family_balances:
@@ -347,18 +373,21 @@ class BalanceService:
         return None
         
     @staticmethod
-    def verify_balance_consistency(db: Session, family_id: str) -> bool:
+    def verify_balance_consistency(db: Session, family_id: str, balances: Optional[List[MemberBalance]] = None) -> bool:
         """
         Verify that the total net balance of all family members is zero.
         
         Args:
             db: Database session
             family_id: ID of the family to verify
+            balances: Balances already calculated for the family; if omitted they
+                are calculated again
             
         Returns:
             bool: True if consistent (sum of balances is approximately zero), False otherwise
         """
-        balances = BalanceService.calculate_family_balances(db, family_id)
+        if balances is None:
+            balances = BalanceService.calculate_family_balances(db, family_id)
         total_net_balance = sum(balance.net_balance for balance in balances)
         
         # Allow for small floating point errors
@@ -1,6 +1,9 @@
+from typing import Iterator
+from sqlalchemy import delete, insert, select
 from sqlalchemy.orm import Session
-from app.models.models import Expense, Member
-from app.models.schemas import ExpenseCreate, ExpenseUpdate
+from fastapi import HTTPException, status
+from app.models.models import Expense, ExpenseShare, Member, utcnow
+from app.models.schemas import ExpenseCreate, ExpenseUpdate, ExpenseListAdapter, dump_list_json, normalize_uuid
 
 class ExpenseService:
     """
@@ -32,6 +35,8 @@ class ExpenseService:
             paid_by=expense.paid_by
         )
         
+        db.add(db_expense)
+        
         # Get the family of the paying member
         payer = db.query(Member).filter(Member.id == expense.paid_by).first()
         if payer:
@@ -40,14 +45,13 @@ class ExpenseService:
             # If split_among is not specified, split among all family members
             if not expense.split_among:
                 # Get all family members
-                family_members = db.query(Member).filter(Member.family_id == payer.family_id).all()
-                db_expense.split_among = family_members
+                family_member_ids = [m.id for m in db.query(Member.id).filter(Member.family_id == payer.family_id)]
+                ExpenseService._split_expense(db, db_expense, family_member_ids)
             else:
                 # Use the specified members
-                members = db.query(Member).filter(Member.id.in_(expense.split_among)).all()
-                db_expense.split_among = members
+                member_ids = ExpenseService._get_split_member_ids(db, payer.family_id, expense.split_among)
+                ExpenseService._split_expense(db, db_expense, member_ids)
         
-        db.add(db_expense)
         db.commit()
         db.refresh(db_expense)
         return db_expense
@@ -92,12 +96,44 @@ class ExpenseService:
         Returns:
             List[Expense]: List of expenses for the family
         """
-        # Get the IDs of the family members
-        member_ids = [m.id for m in db.query(Member).filter(Member.family_id == family_id).all()]
-        
-        # Get expenses where the payer is a family member
+        # Get expenses where the payer is a family member; the member IDs are
+        # filtered in a subquery instead of loading the members first
+        member_ids = select(Member.id).where(Member.family_id == family_id)
         return db.query(Expense).filter(Expense.paid_by.in_(member_ids)).all()
     
+    @staticmethod
+    def stream_expenses_by_family_json(db: Session, family_id: str, batch_size: int = 1000) -> Iterator[bytes]:
+        """
+        Stream the expenses of a family as a JSON array.
+        
+        Rows are fetched from a server-side cursor in batches of batch_size and
+        each batch is encoded as soon as it arrives, so memory use does not grow
+        with the expense history. The query runs when iteration starts, and the
+        session is closed when the stream ends.
+        
+        Args:
+            db: Database session
+            family_id: ID of the family to get expenses for
+            batch_size: Number of rows fetched and encoded at a time
+            
+        Yields:
+            bytes: Consecutive chunks of a JSON array with the same shape as List[schemas.Expense]
+        """
+        # Same filter as get_expenses_by_family: expenses paid by a family member
+        member_ids = select(Member.id).where(Member.family_id == family_id)
+        stmt = select(Expense).where(Expense.paid_by.in_(member_ids)).execution_options(yield_per=batch_size)
+        
+        try:
+            yield b"["
+            separator = b""
+            for batch in db.execute(stmt).scalars().partitions():
+                # Quitar los corchetes del array de cada lote para unirlos en uno solo
+                yield separator + dump_list_json(ExpenseListAdapter, batch)[1:-1]
+                separator = b","
+            yield b"]"
+        finally:
+            db.close()
+    
     @staticmethod
     def update_expense(db: Session, expense_id: str, expense_update: ExpenseUpdate):
         """
@@ -138,12 +174,22 @@ class ExpenseService:
         if expense_update.split_among is not None:
             if not expense_update.split_among:
                 # If the list is empty, split among all family members
-                family_members = db.query(Member).filter(Member.family_id == db_expense.family_id).all()
-                db_expense.split_among = family_members
+                family_member_ids = [m.id for m in db.query(Member.id).filter(Member.family_id == db_expense.family_id)]
+                ExpenseService._split_expense(db, db_expense, family_member_ids)
             else:
                 # Use the specified members
-                members = db.query(Member).filter(Member.id.in_(expense_update.split_among)).all()
-                db_expense.split_among = members
+                member_ids = ExpenseService._get_split_member_ids(db, db_expense.family_id, expense_update.split_among)
+                ExpenseService._split_expense(db, db_expense, member_ids)
+            # Las partes están en otra tabla: cambiar solo el reparto no modifica
+            # la fila del gasto, así que su updated_at se actualiza explícitamente
+            db_expense.updated_at = utcnow()
+        elif expense_update.amount is not None or expense_update.paid_by is not None:
+            # Recalculate the existing shares for the new amount or family
+            share_member_ids = [
+                share.member_id
+                for share in db.query(ExpenseShare.member_id).filter(ExpenseShare.expense_id == db_expense.id)
+            ]
+            ExpenseService._split_expense(db, db_expense, share_member_ids)
         
         db.commit()
         db.refresh(db_expense)
@@ -165,4 +211,86 @@ class ExpenseService:
         if db_expense:
             db.delete(db_expense)
             db.commit()
-        return db_expense 
\ No newline at end of file
+        return db_expense
+    
+    @staticmethod
+    def _get_split_member_ids(db: Session, family_id: str, split_among):
+        """
+        Validate the members an expense is split among.
+        
+        Args:
+            db: Database session
+            family_id: ID of the expense's family
+            split_among: IDs of the members to split the expense among
+            
+        Returns:
+            list: IDs of the members in canonical form, all of them in the family
+            
+        Raises:
+            HTTPException: If any of the IDs is not a valid UUID, or any of the
+                members doesn't exist or belongs to another family
+        """
+        # Los ids se comparan en forma canónica: PostgreSQL acepta un UUID en
+        # mayúsculas o sin guiones, pero lo devuelve en minúsculas con guiones
+        requested_ids = set()
+        for member_id in split_among:
+            try:
+                requested_ids.add(normalize_uuid(member_id))
+            except ValueError:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Invalid member ID: {member_id}"
+                )
+        
+        # Una sola consulta IN comprueba todos los miembros a la vez
+        member_ids = [
+            normalize_uuid(member_id)
+            for member_id in db.scalars(
+                select(Member.id).where(Member.id.in_(requested_ids), Member.family_id == family_id)
+            )
+        ]
+        missing = requested_ids.difference(member_ids)
+        if missing:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Members not in family: {sorted(missing)}"
+            )
+        return member_ids
+    
+    @staticmethod
+    def _split_expense(db: Session, db_expense: Expense, member_ids):
+        """
+        Split an expense equally among the given members.
+        
+        Replaces the expense shares with one share per member, storing each
+        member's part of the amount and the expense's family. The amount is
+        split in whole cents and the remaining cents go to the first members, so
+        the shares always add up to the expense amount. The shares are written
+        with a single DELETE and a single multi-row INSERT.
+        
+        Args:
+            db: Database session
+            db_expense: The expense to split
+            member_ids: IDs of the members who share the expense
+        """
+        # El gasto debe existir en la base de datos antes de insertar sus partes
+        db.flush()
+        
+        db.execute(delete(ExpenseShare).where(ExpenseShare.expense_id == db_expense.id))
+        if member_ids:
+            share_cents, remainder = divmod(round(db_expense.amount * 100), len(member_ids))
+            db.execute(
+                insert(ExpenseShare),
+                [
+                    {
+                        "expense_id": db_expense.id,
+                        "member_id": member_id,
+                        "family_id": db_expense.family_id,
+                        "amount_share": (share_cents + (1 if i < remainder else 0)) / 100
+                    }
+                    for i, member_id in enumerate(member_ids)
+                ]
+            )
+        
+        # Las colecciones cargadas ya no reflejan las partes escritas
+        db.expire(db_expense, ["shares", "split_among"])
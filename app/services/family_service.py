@@ -1,11 +1,31 @@
+import hashlib
+from typing import Optional
+from sqlalchemy import bindparam, func, lambda_stmt, select
 from sqlalchemy.orm import Session
 from app.models.models import Family, Member, Payment, Expense
 from app.models.schemas import FamilyCreate, MemberCreate
+from app.services.member_service import MemberService
 from app.utils.logging_config import get_logger
 
 # Configurar logging centralizado
 logger = get_logger("family_service")
 
+# Whether a family exists and the number of rows and last modification of its
+# members, expenses and payments, fetched in a single round-trip. Any insert,
+# update or delete of those rows changes the result, so it identifies the
+# state of the family
+_SELECT_FAMILY_VERSION = lambda_stmt(
+    lambda: select(
+        select(func.count(Family.id)).where(Family.id == bindparam("family_id")).scalar_subquery(),
+        select(func.count(Member.id)).where(Member.family_id == bindparam("family_id")).scalar_subquery(),
+        select(func.max(Member.updated_at)).where(Member.family_id == bindparam("family_id")).scalar_subquery(),
+        select(func.count(Expense.id)).where(Expense.family_id == bindparam("family_id")).scalar_subquery(),
+        select(func.max(Expense.updated_at)).where(Expense.family_id == bindparam("family_id")).scalar_subquery(),
+        select(func.count(Payment.id)).where(Payment.family_id == bindparam("family_id")).scalar_subquery(),
+        select(func.max(Payment.updated_at)).where(Payment.family_id == bindparam("family_id")).scalar_subquery()
+    )
+)
+
 class FamilyService:
     """
     Service for managing families.
@@ -49,6 +69,8 @@ class FamilyService:
         
         db.commit()
         db.refresh(db_family)
+        for member_data in family.members:
+            MemberService.invalidate_cached_member(member_data.telegram_id)
         logger.info(f"Created family '{family.name}' with {len(db_family.members)} members")
         return db_family
     
@@ -72,6 +94,29 @@ class FamilyService:
             logger.debug(f"Family not found with ID: {family_id}")
         return family
     
+    @staticmethod
+    def get_family_etag(db: Session, family_id: str) -> Optional[str]:
+        """
+        Get an entity tag for the current state of a family.
+        
+        The tag is a 16-byte BLAKE2b hash of the family ID and the number of rows
+        and latest updated_at of its members, expenses and payments, so it changes
+        whenever any of them is created, modified or deleted.
+        
+        Args:
+            db: Database session
+            family_id: ID of the family
+            
+        Returns:
+            str: The entity tag as a hexadecimal string, or None if the family
+                doesn't exist
+        """
+        version = db.execute(_SELECT_FAMILY_VERSION, {"family_id": family_id}).one()
+        if not version[0]:
+            return None
+        key = ":".join([family_id, *map(str, version)])
+        return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+    
     @staticmethod
     def get_family_members(db: Session, family_id: str):
         """
@@ -123,6 +168,7 @@ class FamilyService:
         db.add(db_member)
         db.commit()
         db.refresh(db_member)
+        MemberService.invalidate_cached_member(db_member.telegram_id)
         logger.info(f"Member {member.name} added to family {family_id} with ID: {db_member.id}")
         return db_member
         
@@ -147,7 +193,7 @@ class FamilyService:
         Note:
             Esta operación no se puede deshacer y borra todos los datos relacionados con la familia.
         """
-        from app.models.models import Payment, Expense
+        from app.models.models import Payment, Expense, ExpenseShare
         
         logger.info(f"Requested deletion of family with ID: {family_id}")
         
@@ -169,6 +215,9 @@ class FamilyService:
             logger.debug(f"Deleting {payments_count} payments for family {family_id}")
             db.query(Payment).filter(Payment.family_id == family_id).delete()
             
+            # Eliminar las partes de los gastos de la familia antes que los gastos
+            db.query(ExpenseShare).filter(ExpenseShare.family_id == family_id).delete()
+            
             # Eliminar gastos asociados a la familia
             logger.debug(f"Deleting {expenses_count} expenses for family {family_id}")
             db.query(Expense).filter(Expense.family_id == family_id).delete()
@@ -182,6 +231,9 @@ class FamilyService:
             db.delete(family)
             
             db.commit()
+            
+            # Los miembros eliminados no deben seguir resolviéndose desde la caché
+            MemberService.invalidate_cached_member()
             logger.info(f"Family {family_id} and all related data successfully deleted")
             
             return {
@@ -1,7 +1,59 @@
+from sqlalchemy import bindparam, lambda_stmt, select
 from sqlalchemy.orm import Session
+from typing import Optional
+from cachetools import TTLCache
+import threading
 from app.models.models import Member
 from app.models.schemas import MemberCreate, MemberUpdate
 
+# Member lookup by Telegram ID (backed by the unique index ix_members_telegram_id).
+# Built as a lambda statement so SQLAlchemy caches both the statement construction
+# and its compiled SQL, keyed on the lambda's code object
+_SELECT_MEMBER_BY_TELEGRAM_ID = lambda_stmt(
+    lambda: select(Member).where(Member.telegram_id == bindparam("telegram_id"))
+)
+
+# Family of a member, by Telegram ID or by member ID. Permission checks only need
+# this column, so the rest of the row isn't fetched or loaded into the ORM
+_SELECT_FAMILY_ID_BY_TELEGRAM_ID = lambda_stmt(
+    lambda: select(Member.family_id).where(Member.telegram_id == bindparam("telegram_id"))
+)
+_SELECT_FAMILY_ID_BY_MEMBER_ID = lambda_stmt(
+    lambda: select(Member.family_id).where(Member.id == bindparam("member_id"))
+)
+
+# Families of the member with a Telegram ID and of another member, fetched in a
+# single round-trip for permission checks (NULL where the member doesn't exist)
+_SELECT_FAMILIES_FOR_PERMISSION = lambda_stmt(
+    lambda: select(
+        select(Member.family_id).where(Member.telegram_id == bindparam("telegram_id")).scalar_subquery(),
+        select(Member.family_id).where(Member.id == bindparam("member_id")).scalar_subquery()
+    )
+)
+
+# Families of the member with a Telegram ID and of both members of a payment,
+# fetched in a single round-trip (NULL where the member doesn't exist)
+_SELECT_FAMILIES_FOR_PAYMENT = lambda_stmt(
+    lambda: select(
+        select(Member.family_id).where(Member.telegram_id == bindparam("telegram_id")).scalar_subquery(),
+        select(Member.family_id).where(Member.id == bindparam("from_member_id")).scalar_subquery(),
+        select(Member.family_id).where(Member.id == bindparam("to_member_id")).scalar_subquery()
+    )
+)
+
+# Short-lived cache of telegram_id -> member ID, used to resolve authenticated
+# members with a primary-key lookup instead of filtering by telegram_id
+_member_id_cache = TTLCache(maxsize=5000, ttl=30)
+_member_id_cache_lock = threading.Lock()
+
+# Cache of telegram_id -> family ID for permission checks, so requests that only
+# need to know the requester's family don't query the database on a hit
+_member_family_id_cache = TTLCache(maxsize=10_000, ttl=60)
+
+# Very short-lived cache of telegram_ids that don't belong to any member, so
+# repeated attempts with unknown IDs don't reach the database every time
+_unknown_telegram_id_cache = TTLCache(maxsize=50_000, ttl=5)
+
 class MemberService:
     """
     Service for managing members.
@@ -30,6 +82,7 @@ class MemberService:
         db.add(db_member)
         db.commit()
         db.refresh(db_member)
+        MemberService.invalidate_cached_member(db_member.telegram_id)
         return db_member
     
     @staticmethod
@@ -58,7 +111,173 @@ class MemberService:
         Returns:
             Member: The requested member or None if not found
         """
-        return db.query(Member).filter(Member.telegram_id == telegram_id).first()
+        return db.execute(
+            _SELECT_MEMBER_BY_TELEGRAM_ID, {"telegram_id": telegram_id}
+        ).scalar_one_or_none()
+    
+    @staticmethod
+    def get_member_family_id(db: Session, telegram_id: str) -> Optional[str]:
+        """
+        Get the family ID of the member with a Telegram ID.
+        
+        The result is cached for a short time and invalidated together with the
+        other member caches, so repeated permission checks from the same user
+        don't reach the database.
+        
+        Args:
+            db: Database session
+            telegram_id: Telegram ID of the member
+            
+        Returns:
+            str: The member's family ID or None if no member has that Telegram ID
+        """
+        with _member_id_cache_lock:
+            family_id = _member_family_id_cache.get(telegram_id)
+        if family_id is not None:
+            return family_id
+        
+        family_id = db.execute(
+            _SELECT_FAMILY_ID_BY_TELEGRAM_ID, {"telegram_id": telegram_id}
+        ).scalar_one_or_none()
+        if family_id is None:
+            return None
+        
+        with _member_id_cache_lock:
+            _member_family_id_cache[telegram_id] = family_id
+        return family_id
+    
+    @staticmethod
+    def get_family_id(db: Session, member_id: str) -> Optional[str]:
+        """
+        Get the family ID of a member.
+        
+        Only the family_id column is selected, for permission checks that don't
+        need the rest of the member.
+        
+        Args:
+            db: Database session
+            member_id: ID of the member
+            
+        Returns:
+            str: The member's family ID or None if the member doesn't exist
+        """
+        return db.execute(
+            _SELECT_FAMILY_ID_BY_MEMBER_ID, {"member_id": member_id}
+        ).scalar_one_or_none()
+    
+    @staticmethod
+    def verify_same_family(db: Session, telegram_id: str, member_id: str) -> Optional[bool]:
+        """
+        Check whether the member with a Telegram ID belongs to the same family as another member.
+        
+        Both members are looked up with a single query.
+        
+        Args:
+            db: Database session
+            telegram_id: Telegram ID of the requesting member
+            member_id: ID of the other member
+            
+        Returns:
+            bool: True if both members belong to the same family, False if they don't,
+                or None if either member doesn't exist
+        """
+        requester_family_id, member_family_id = db.execute(
+            _SELECT_FAMILIES_FOR_PERMISSION, {"telegram_id": telegram_id, "member_id": member_id}
+        ).one()
+        if requester_family_id is None or member_family_id is None:
+            return None
+        return requester_family_id == member_family_id
+    
+    @staticmethod
+    def verify_payment_family(db: Session, telegram_id: str, from_member_id: str, to_member_id: str) -> bool:
+        """
+        Check whether the member with a Telegram ID and both members of a payment belong to the same family.
+        
+        The three members are looked up with a single query.
+        
+        Args:
+            db: Database session
+            telegram_id: Telegram ID of the requesting member
+            from_member_id: ID of the member sending the payment
+            to_member_id: ID of the member receiving the payment
+            
+        Returns:
+            bool: True if the three members exist and belong to the same family
+        """
+        requester_family_id, from_family_id, to_family_id = db.execute(
+            _SELECT_FAMILIES_FOR_PAYMENT,
+            {"telegram_id": telegram_id, "from_member_id": from_member_id, "to_member_id": to_member_id}
+        ).one()
+        return requester_family_id is not None and requester_family_id == from_family_id == to_family_id
+    
+    @staticmethod
+    def get_cached_member_id(telegram_id: str) -> Optional[str]:
+        """
+        Get the cached member ID for a Telegram ID.
+        
+        Args:
+            telegram_id: Telegram ID of the member
+            
+        Returns:
+            str: The cached member ID or None if it is not cached
+        """
+        with _member_id_cache_lock:
+            return _member_id_cache.get(telegram_id)
+    
+    @staticmethod
+    def cache_member_id(telegram_id: str, member_id: str):
+        """
+        Cache the member ID associated with a Telegram ID.
+        
+        Args:
+            telegram_id: Telegram ID of the member
+            member_id: ID of the member
+        """
+        with _member_id_cache_lock:
+            _member_id_cache[telegram_id] = member_id
+    
+    @staticmethod
+    def is_unknown_telegram_id(telegram_id: str) -> bool:
+        """
+        Check whether a Telegram ID was recently looked up without finding a member.
+        
+        Args:
+            telegram_id: Telegram ID to check
+            
+        Returns:
+            bool: True if the Telegram ID is cached as unknown
+        """
+        with _member_id_cache_lock:
+            return telegram_id in _unknown_telegram_id_cache
+    
+    @staticmethod
+    def mark_unknown_telegram_id(telegram_id: str):
+        """
+        Cache a Telegram ID that doesn't belong to any member.
+        
+        Args:
+            telegram_id: Telegram ID that was not found
+        """
+        with _member_id_cache_lock:
+            _unknown_telegram_id_cache[telegram_id] = True
+    
+    @staticmethod
+    def invalidate_cached_member(telegram_id: Optional[str] = None):
+        """
+        Remove a Telegram ID from the member ID, family ID and unknown Telegram ID caches.
+        
+        Args:
+            telegram_id: Telegram ID to invalidate. If None, all the caches are cleared.
+        """
+        with _member_id_cache_lock:
+            if telegram_id is None:
+                _member_id_cache.clear()
+                _member_family_id_cache.clear()
+                _unknown_telegram_id_cache.clear()
+            else:
+                _member_id_cache.pop(telegram_id, None)
+                _member_family_id_cache.pop(telegram_id, None)
+                _unknown_telegram_id_cache.pop(telegram_id, None)
     
     @staticmethod
     def update_member(db: Session, member_id: str, member: MemberUpdate):
@@ -77,12 +296,16 @@ class MemberService:
         if not db_member:
             return None
         
+        # The Telegram ID may change, so forget the cached lookup
+        MemberService.invalidate_cached_member(db_member.telegram_id)
+        
         # Update the fields
         for key, value in member.dict(exclude_unset=True).items():
             setattr(db_member, key, value)
         
         db.commit()
         db.refresh(db_member)
+        MemberService.invalidate_cached_member(db_member.telegram_id)
         return db_member
     
     @staticmethod
@@ -101,6 +324,11 @@ class MemberService:
         if not db_member:
             return None
         
+        # Invalidar también tras el commit: una petición concurrente puede haber
+        # vuelto a guardar la familia del miembro en la caché mientras tanto
+        telegram_id = db_member.telegram_id
+        MemberService.invalidate_cached_member(telegram_id)
         db.delete(db_member)
         db.commit()
+        MemberService.invalidate_cached_member(telegram_id)
         return db_member 
\ No newline at end of file
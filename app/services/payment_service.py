@@ -1,6 +1,8 @@
+from typing import Iterator
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from app.models.models import Payment, Member, PaymentStatus
-from app.models.schemas import PaymentCreate, PaymentUpdate
+from app.models.schemas import PaymentCreate, PaymentUpdate, PaymentListAdapter, dump_list_json
 from fastapi import HTTPException, status
 from sqlalchemy.orm import joinedload
 from app.utils.logging_config import get_logger
@@ -321,6 +323,41 @@ class PaymentService:
         logger.info(f"Found {len(payments)} payments for family {family_id}")
         return payments
     
+    @staticmethod
+    def stream_payments_by_family_json(db: Session, family_id: str, batch_size: int = 1000) -> Iterator[bytes]:
+        """
+        Stream the payments of a family as a JSON array.
+        
+        Rows are fetched from a server-side cursor in batches of batch_size and
+        each batch is encoded as soon as it arrives, so memory use does not grow
+        with the payment history. The query runs when iteration starts, and the
+        session is closed when the stream ends.
+        
+        Args:
+            db: Database session
+            family_id: ID of the family to get payments for
+            batch_size: Number of rows fetched and encoded at a time
+            
+        Yields:
+            bytes: Consecutive chunks of a JSON array with the same shape as List[schemas.Payment]
+        """
+        # Same filter as get_payments_by_family: the payer or receiver is a family member
+        member_ids = select(Member.id).where(Member.family_id == family_id)
+        stmt = select(Payment).where(
+            Payment.from_member_id.in_(member_ids) | Payment.to_member_id.in_(member_ids)
+        ).execution_options(yield_per=batch_size)
+        
+        try:
+            yield b"["
+            separator = b""
+            for batch in db.execute(stmt).scalars().partitions():
+                # Quitar los corchetes del array de cada lote para unirlos en uno solo
+                yield separator + dump_list_json(PaymentListAdapter, batch)[1:-1]
+                separator = b","
+            yield b"]"
+        finally:
+            db.close()
+    
     @staticmethod
     def delete_payment(db: Session, payment_id: str):
         """
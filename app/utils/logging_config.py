@@ -3,15 +3,30 @@ Logging Configuration Module
 
 This module defines the configuration for the application's logging system.
 It provides a consistent logging setup that can be used across the application.
+
+Los loggers no escriben directamente en consola ni en disco: cada registro se
+encola mediante un QueueHandler y un QueueListener en un hilo de fondo se
+encarga del formateo y la escritura, de modo que el hilo que atiende la
+solicitud solo paga el coste de un put en la cola.
 """
 
+import atexit
 import logging
+import queue
 import sys
-from logging.handlers import RotatingFileHandler
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 import os
 
-# Configuración base para todos los loggers
-LOG_LEVEL = logging.INFO
+from app.config import LOG_LEVEL as LOG_LEVEL_NAME
+
+# Configuración base para todos los loggers. Con un nivel superior a INFO los
+# registros descartados no llegan a formatearse, ya que los mensajes usan
+# argumentos al estilo % en lugar de f-strings
+LOG_LEVEL = logging.getLevelName(LOG_LEVEL_NAME)
+if not isinstance(LOG_LEVEL, int):
+    raise ValueError(f"Unsupported LOG_LEVEL '{LOG_LEVEL_NAME}'. Expected one of: DEBUG, INFO, WARNING, ERROR, CRITICAL")
 LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 LOG_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
 
@@ -20,44 +35,240 @@ LOG_DIR = "logs"
 if not os.path.exists(LOG_DIR):
     os.makedirs(LOG_DIR)
 
+# Tamaño del buffer de cada archivo de log. Los buffers se vacían cuando la cola
+# lleva LOG_FLUSH_IDLE segundos sin registros nuevos, y como máximo cada
+# LOG_FLUSH_INTERVAL segundos si nunca llega a estar inactiva
+LOG_FILE_BUFFER_SIZE = 64 * 1024
+LOG_FLUSH_IDLE = 0.05
+LOG_FLUSH_INTERVAL = 1.0
+
+_formatter = logging.Formatter(LOG_FORMAT, LOG_DATE_FORMAT)
+
+
+class _DeferredFlushMixin:
+    """
+    Mixin para handlers de stream que no vacían el stream tras cada registro.
+
+    StreamHandler.emit llama a flush() después de escribir cada registro, lo que
+    supone una llamada al sistema por línea. Con este mixin los registros se
+    acumulan en el buffer del stream y se escriben al llamar a flush_pending(),
+    que el listener invoca cuando la cola se vacía.
+    """
+
+    def flush(self):
+        pass
+
+    def flush_pending(self):
+        # Igual que logging.shutdown: el stream puede estar ya cerrado al salir
+        try:
+            super().flush()
+        except (OSError, ValueError):
+            pass
+
+
+class _ConsoleHandler(_DeferredFlushMixin, logging.StreamHandler):
+    """StreamHandler de consola con vaciado diferido."""
+
+
+class _BufferedRotatingFileHandler(_DeferredFlushMixin, RotatingFileHandler):
+    """
+    RotatingFileHandler con un buffer de LOG_FILE_BUFFER_SIZE y vaciado diferido.
+
+    RotatingFileHandler comprueba el tamaño del archivo con un seek antes de cada
+    registro, lo que vacía el buffer del stream. Aquí el tamaño se lleva en
+    memoria para que los registros se acumulen en el buffer.
+    """
+
+    def _open(self):
+        stream = open(
+            self.baseFilename, self.mode, buffering=LOG_FILE_BUFFER_SIZE,
+            encoding=self.encoding, errors=self.errors
+        )
+        self._size = stream.seek(0, os.SEEK_END)
+        return stream
+
+    def emit(self, record):
+        try:
+            msg = self.format(record) + self.terminator
+            if self.stream is None:
+                self.stream = self._open()
+            if self.maxBytes > 0 and self._size > 0 and self._size + len(msg) >= self.maxBytes:
+                self.doRollover()
+            self.stream.write(msg)
+            self._size += len(msg)
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+
+# Handler de consola compartido por todos los loggers de la aplicación, para
+# que exista un único StreamHandler en todo el proceso
+_console_handler = _ConsoleHandler(sys.stdout)
+_console_handler.setFormatter(_formatter)
+
+
+class _ModuleFileHandler(logging.Handler):
+    """
+    Handler que envía cada registro al archivo de log de su módulo.
+
+    Cada módulo tiene su propio archivo de log; este handler mantiene un
+    RotatingFileHandler por módulo y elige el adecuado según el nombre del logger.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._handlers = {}
+
+    def emit(self, record):
+        module_name = record.name.split('.')[-1]
+        handler = self._handlers.get(module_name)
+        if handler is None:
+            handler = _BufferedRotatingFileHandler(
+                f"{LOG_DIR}/{module_name}.log",
+                maxBytes=10485760,  # 10MB
+                backupCount=5
+            )
+            handler.setFormatter(_formatter)
+            self._handlers[module_name] = handler
+        handler.handle(record)
+
+    def flush_pending(self):
+        for handler in self._handlers.values():
+            handler.flush_pending()
+
+    def close(self):
+        for handler in self._handlers.values():
+            handler.close()
+        super().close()
+
+
+class _InProcessQueueHandler(QueueHandler):
+    """
+    QueueHandler que encola el registro sin formatearlo.
+
+    El QueueHandler estándar formatea el mensaje antes de encolarlo (para poder
+    enviarlo a otro proceso). Como la cola es local al proceso, el formateo se
+    deja al QueueListener, fuera del hilo de la solicitud.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class _BatchingQueueListener(QueueListener):
+    """
+    QueueListener que vacía los buffers de sus handlers por lotes.
+
+    Los handlers se vacían cuando la cola queda inactiva durante LOG_FLUSH_IDLE
+    segundos, y como mínimo cada LOG_FLUSH_INTERVAL segundos, de modo que una
+    ráfaga de registros se escribe con unas pocas llamadas al sistema.
+    """
+
+    def __init__(self, queue, *handlers, respect_handler_level=False):
+        super().__init__(queue, *handlers, respect_handler_level=respect_handler_level)
+        self._last_flush = time.monotonic()
+
+    def dequeue(self, block):
+        try:
+            return self.queue.get(timeout=LOG_FLUSH_IDLE)
+        except queue.Empty:
+            # Sin registros nuevos: escribir lo acumulado y esperar al siguiente
+            self._flush_handlers()
+            return self.queue.get(block)
+
+    def handle(self, record):
+        super().handle(record)
+        if time.monotonic() - self._last_flush >= LOG_FLUSH_INTERVAL:
+            self._flush_handlers()
+
+    def stop(self):
+        super().stop()
+        # Escribir los registros procesados justo antes del centinela de parada
+        self._flush_handlers()
+
+    def _flush_handlers(self):
+        for handler in self.handlers:
+            handler.flush_pending()
+        self._last_flush = time.monotonic()
+
+
+# Cola y listener únicos para todo el proceso
+_log_queue = queue.SimpleQueue()
+_queue_handler = _InProcessQueueHandler(_log_queue)
+_listener = _BatchingQueueListener(
+    _log_queue, _console_handler, _ModuleFileHandler(), respect_handler_level=True
+)
+_listener_lock = threading.Lock()
+_listener_started = False
+
+
+def _ensure_listener_started():
+    """
+    Start the background log listener once per process.
+    """
+    global _listener_started
+    if _listener_started:
+        return
+    with _listener_lock:
+        if not _listener_started:
+            _listener.start()
+            # Vaciar la cola al salir para no perder registros pendientes
+            atexit.register(_listener.stop)
+            _listener_started = True
+
+
 def get_logger(name):
     """
     Get a configured logger with the specified name.
-    
+
     Args:
         name (str): Name for the logger, typically __name__
-        
+
     Returns:
         logging.Logger: Configured logger instance
     """
     logger = logging.getLogger(name)
-    
+
     # Evitar agregar múltiples handlers si el logger ya está configurado
     if logger.handlers:
         return logger
-    
+
     logger.setLevel(LOG_LEVEL)
-    
-    # Configurar el formato para todos los handlers
-    formatter = logging.Formatter(LOG_FORMAT, LOG_DATE_FORMAT)
-    
-    # Handler para consola
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-    
-    # Handler para archivo
-    # Cada módulo tiene su propio archivo de log
-    module_name = name.split('.')[-1]
-    file_handler = RotatingFileHandler(
-        f"{LOG_DIR}/{module_name}.log", 
-        maxBytes=10485760,  # 10MB
-        backupCount=5
-    )
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
-    
+
+    # La escritura en consola y en archivo se hace en el hilo del listener
+    _ensure_listener_started()
+    logger.addHandler(_queue_handler)
+
     # Evitar propagar logs al logger raíz para prevenir duplicados
     logger.propagate = False
-    
-    return logger 
\ No newline at end of file
+
+    return logger
+
+
+# Número máximo de cabeceras incluidas al registrar una solicitud en modo debug
+MAX_LOGGED_HEADERS = 20
+
+# Cabeceras cuyo valor nunca se registra
+_REDACTED_HEADERS = frozenset({"authorization", "cookie", "proxy-authorization"})
+
+
+def loggable_headers(headers):
+    """
+    Build a small, log-safe view of the request headers.
+
+    Solo se incluyen las primeras MAX_LOGGED_HEADERS cabeceras y se ocultan las
+    credenciales, para no copiar ni formatear cabeceras enormes en cada error.
+
+    Args:
+        headers: The request headers (Starlette Headers or any mapping)
+
+    Returns:
+        dict: Header names mapped to their (possibly redacted) values
+    """
+    summary = {}
+    for name, value in headers.items():
+        if len(summary) >= MAX_LOGGED_HEADERS:
+            break
+        summary[name] = "<redacted>" if name.lower() in _REDACTED_HEADERS else value
+    return summary
@@ -0,0 +1,56 @@
+"""Add included columns to the indexes read by the balance calculation
+
+Revision ID: 1c7e9a4d2f60
+Revises: 8d3f5a2e7b16
+Create Date: 2026-10-15 17:38:26.104583
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1c7e9a4d2f60'
+down_revision: Union[str, None] = '8d3f5a2e7b16'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (nombre, tabla, columnas, columnas incluidas, condición)
+# Deben coincidir con los índices declarados en app/models/models.py
+COVERING_INDEXES = [
+    ('ix_payments_family_id_confirmed', 'payments', 'family_id',
+     'id, from_member_id, to_member_id, amount', 'status = 1'),
+    ('ix_expenses_paid_by', 'expenses', 'paid_by', 'id', None),
+]
+
+
+def _create_index(name, table, columns, include, where) -> None:
+    sql = f'CREATE INDEX {name} ON {table} ({columns})'
+    if include:
+        sql += f' INCLUDE ({include})'
+    if where:
+        sql += f' WHERE {where}'
+    op.execute(sql)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # INCLUDE solo existe en PostgreSQL
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for name, table, columns, include, where in COVERING_INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
+        _create_index(name, table, columns, include, where)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for name, table, columns, _, where in COVERING_INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
+        _create_index(name, table, columns, None, where)
@@ -0,0 +1,31 @@
+"""Ensure unique index on members.telegram_id
+
+Revision ID: 3f6d2a9c8b71
+Revises: 912a1d143c89
+Create Date: 2026-10-15 10:12:41.183502
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f6d2a9c8b71'
+down_revision: Union[str, None] = '912a1d143c89'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Las búsquedas de autenticación filtran por telegram_id, por lo que la columna
+    # debe tener un índice único. Las bases creadas con create_all ya lo tienen.
+    op.execute("CREATE UNIQUE INDEX IF NOT EXISTS ix_members_telegram_id ON members (telegram_id)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # El índice forma parte de la definición original del modelo Member,
+    # por lo que no se elimina al revertir esta migración
+    pass
@@ -0,0 +1,53 @@
+"""Add composite lookup indexes and drop redundant primary key indexes
+
+Revision ID: 5b9d07e3c4a2
+Revises: c2e8f4a61d37
+Create Date: 2026-10-15 15:02:44.907361
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b9d07e3c4a2'
+down_revision: Union[str, None] = 'c2e8f4a61d37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Índices que siguen los filtros de los servicios (familia, pagador, emisor y receptor)
+LOOKUP_INDEXES = {
+    'ix_members_family_id': ('members', 'family_id'),
+    'ix_expenses_family_id_paid_by': ('expenses', 'family_id, paid_by'),
+    'ix_expenses_paid_by': ('expenses', 'paid_by'),
+    'ix_payments_from_member_id_family_id': ('payments', 'from_member_id, family_id'),
+    'ix_payments_to_member_id_family_id': ('payments', 'to_member_id, family_id'),
+}
+
+# Índices sobre la clave primaria, redundantes con el índice de la propia clave
+PRIMARY_KEY_INDEXES = {
+    'ix_families_id': 'families',
+    'ix_members_id': 'members',
+    'ix_expenses_id': 'expenses',
+    'ix_payments_id': 'payments',
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for name, (table, columns) in LOOKUP_INDEXES.items():
+        op.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})')
+
+    for name in PRIMARY_KEY_INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table in PRIMARY_KEY_INDEXES.items():
+        op.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} (id)')
+
+    for name in LOOKUP_INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
@@ -0,0 +1,65 @@
+"""Store monetary amounts as NUMERIC(12,2)
+
+Revision ID: 6f2b8d1e9a47
+Revises: 1c7e9a4d2f60
+Create Date: 2026-10-15 18:12:40.385216
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6f2b8d1e9a47'
+down_revision: Union[str, None] = '1c7e9a4d2f60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Columnas monetarias, por tabla
+AMOUNT_COLUMNS = {
+    'expenses': 'amount',
+    'payments': 'amount',
+    'expense_member_association': 'amount_share',
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # SQLite no distingue entre tipos numéricos
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for table, column in AMOUNT_COLUMNS.items():
+        op.execute(
+            f'ALTER TABLE {table} ALTER COLUMN {column} TYPE numeric(12,2) '
+            f'USING round({column}::numeric, 2)'
+        )
+
+    # Repartir de nuevo cada gasto en céntimos, como ExpenseService._split_expense:
+    # los céntimos sobrantes van a los primeros miembros y las partes suman el importe
+    op.execute("""
+        UPDATE expense_member_association AS a
+        SET amount_share = s.amount_share
+        FROM (
+            SELECT a.expense_id, a.member_id,
+                   (floor(e.amount * 100 / count(*) OVER w)
+                    + CASE WHEN row_number() OVER (w ORDER BY a.member_id)
+                                <= mod(e.amount * 100, count(*) OVER w)
+                           THEN 1 ELSE 0 END) / 100 AS amount_share
+            FROM expense_member_association AS a
+            JOIN expenses AS e ON e.id = a.expense_id
+            WINDOW w AS (PARTITION BY a.expense_id)
+        ) AS s
+        WHERE s.expense_id = a.expense_id AND s.member_id = a.member_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for table, column in AMOUNT_COLUMNS.items():
+        op.execute(f'ALTER TABLE {table} ALTER COLUMN {column} TYPE double precision')
@@ -0,0 +1,38 @@
+"""Drop unused indexes on family name, member name and expense description
+
+Revision ID: 8d3f5a2e7b16
+Revises: e4a1b6c93f58
+Create Date: 2026-10-15 17:04:11.752690
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d3f5a2e7b16'
+down_revision: Union[str, None] = 'e4a1b6c93f58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Ninguna consulta filtra ni ordena por estas columnas de texto, por lo que sus
+# índices solo añaden coste a cada inserción y actualización
+TEXT_INDEXES = {
+    'ix_families_name': ('families', 'name'),
+    'ix_members_name': ('members', 'name'),
+    'ix_expenses_description': ('expenses', 'description'),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for name in TEXT_INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, (table, column) in TEXT_INDEXES.items():
+        op.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({column})')
@@ -0,0 +1,72 @@
+"""Store primary and foreign keys as native UUID
+
+Revision ID: a7c41e0d5b92
+Revises: 3f6d2a9c8b71
+Create Date: 2026-10-15 13:05:27.640118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c41e0d5b92'
+down_revision: Union[str, None] = '3f6d2a9c8b71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Columnas de identificadores, por tabla (primero las tablas referenciadas)
+ID_COLUMNS = {
+    'families': ['id'],
+    'members': ['id', 'family_id'],
+    'expenses': ['id', 'paid_by', 'family_id'],
+    'payments': ['id', 'from_member_id', 'to_member_id', 'family_id'],
+    'expense_member_association': ['expense_id', 'member_id'],
+}
+
+# Claves foráneas (tabla, columna, tabla referenciada) con el nombre por defecto
+# que PostgreSQL les asigna: <tabla>_<columna>_fkey
+FOREIGN_KEYS = [
+    ('members', 'family_id', 'families'),
+    ('expenses', 'paid_by', 'members'),
+    ('expenses', 'family_id', 'families'),
+    ('payments', 'from_member_id', 'members'),
+    ('payments', 'to_member_id', 'members'),
+    ('payments', 'family_id', 'families'),
+    ('expense_member_association', 'expense_id', 'expenses'),
+    ('expense_member_association', 'member_id', 'members'),
+]
+
+
+def _convert_ids(sql_type: str) -> None:
+    """Change every id column to sql_type, recreating the foreign keys around it."""
+    # Solo PostgreSQL tiene un tipo UUID nativo; en SQLite el tipo es indiferente
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for table, column, _ in FOREIGN_KEYS:
+        op.execute(f'ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {table}_{column}_fkey')
+
+    for table, columns in ID_COLUMNS.items():
+        alterations = ', '.join(
+            f'ALTER COLUMN {column} TYPE {sql_type} USING {column}::{sql_type}'
+            for column in columns
+        )
+        op.execute(f'ALTER TABLE {table} {alterations}')
+
+    for table, column, referent in FOREIGN_KEYS:
+        op.create_foreign_key(f'{table}_{column}_fkey', table, referent, [column], ['id'])
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Los identificadores existentes son UUID en formato texto, por lo que la
+    # conversión directa con ::uuid es válida
+    _convert_ids('uuid')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _convert_ids('varchar(36)')
@@ -0,0 +1,46 @@
+"""Add check constraints for payment members and amount
+
+Revision ID: b3e5c7a92d14
+Revises: 6f2b8d1e9a47
+Create Date: 2026-10-15 18:47:09.621853
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e5c7a92d14'
+down_revision: Union[str, None] = '6f2b8d1e9a47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Deben coincidir con los CheckConstraint de Payment en app/models/models.py
+PAYMENT_CHECKS = {
+    'chk_payment_distinct_members': 'from_member_id <> to_member_id',
+    'chk_payment_positive': 'amount > 0',
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # SQLite no permite añadir restricciones a una tabla existente
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    # Crear la restricción NOT VALID y validarla después evita bloquear las
+    # escrituras en payments mientras se comprueban las filas existentes
+    for name, condition in PAYMENT_CHECKS.items():
+        op.execute(f'ALTER TABLE payments ADD CONSTRAINT {name} CHECK ({condition}) NOT VALID')
+        op.execute(f'ALTER TABLE payments VALIDATE CONSTRAINT {name}')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for name in PAYMENT_CHECKS:
+        op.execute(f'ALTER TABLE payments DROP CONSTRAINT IF EXISTS {name}')
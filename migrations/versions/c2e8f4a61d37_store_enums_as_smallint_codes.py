@@ -0,0 +1,66 @@
+"""Store payment status and member language as SMALLINT codes
+
+Revision ID: c2e8f4a61d37
+Revises: a7c41e0d5b92
+Create Date: 2026-10-15 14:21:03.518230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2e8f4a61d37'
+down_revision: Union[str, None] = 'a7c41e0d5b92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (tabla, columna, tipo ENUM original, {valor: código}, valor por defecto)
+# Los códigos deben coincidir con PaymentStatusCode y LanguageCode en app/models/models.py
+ENUM_COLUMNS = [
+    ('payments', 'status', 'paymentstatus', {'PENDING': 0, 'CONFIRM': 1, 'INACTIVE': 2}, 'PENDING'),
+    ('members', 'language', 'language', {'EN': 0, 'ES': 1, 'FR': 2}, 'EN'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for table, column, enum_name, codes, default in ENUM_COLUMNS:
+        cases = ' '.join(f"WHEN '{value}' THEN {code}" for value, code in codes.items())
+        op.execute(f'ALTER TABLE {table} ALTER COLUMN {column} DROP DEFAULT')
+        op.execute(
+            f'ALTER TABLE {table} ALTER COLUMN {column} TYPE smallint '
+            f'USING (CASE {column}::text {cases} END)'
+        )
+        op.execute(f'ALTER TABLE {table} ALTER COLUMN {column} SET DEFAULT {codes[default]}')
+        op.execute(f'DROP TYPE IF EXISTS {enum_name}')
+
+    # Índice parcial para los pagos confirmados, que son los que suman los balances
+    op.execute(
+        'CREATE INDEX IF NOT EXISTS ix_payments_family_id_confirmed '
+        'ON payments (family_id) WHERE status = 1'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('DROP INDEX IF EXISTS ix_payments_family_id_confirmed')
+
+    for table, column, enum_name, codes, default in ENUM_COLUMNS:
+        labels = ', '.join(f"'{value}'" for value in codes)
+        cases = ' '.join(f"WHEN {code} THEN '{value}'" for value, code in codes.items())
+        op.execute(f'CREATE TYPE {enum_name} AS ENUM ({labels})')
+        op.execute(f'ALTER TABLE {table} ALTER COLUMN {column} DROP DEFAULT')
+        op.execute(
+            f'ALTER TABLE {table} ALTER COLUMN {column} TYPE {enum_name} '
+            f'USING (CASE {column} {cases} END)::{enum_name}'
+        )
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN {column} SET DEFAULT '{default}'::{enum_name}")
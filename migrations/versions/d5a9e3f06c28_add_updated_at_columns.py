@@ -0,0 +1,37 @@
+"""Add updated_at to members, expenses and payments
+
+Revision ID: d5a9e3f06c28
+Revises: b3e5c7a92d14
+Create Date: 2026-10-15 23:31:46.208517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a9e3f06c28'
+down_revision: Union[str, None] = 'b3e5c7a92d14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Tablas cuya última modificación forma parte del ETag de una familia
+TABLES = ['members', 'expenses', 'payments']
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # El valor lo genera la aplicación (app.models.models.utcnow), sin valor por
+    # defecto en la base de datos; las filas existentes parten de created_at
+    for table in TABLES:
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True))
+        op.execute(f'UPDATE {table} SET updated_at = created_at')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TABLES:
+        op.drop_column(table, 'updated_at')
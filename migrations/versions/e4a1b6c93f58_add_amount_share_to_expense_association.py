@@ -0,0 +1,75 @@
+"""Store each member's share of an expense in expense_member_association
+
+Revision ID: e4a1b6c93f58
+Revises: 5b9d07e3c4a2
+Create Date: 2026-10-15 16:18:52.337904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a1b6c93f58'
+down_revision: Union[str, None] = '5b9d07e3c4a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('expense_member_association', sa.Column('family_id', sa.Uuid(as_uuid=False), nullable=True))
+    op.add_column(
+        'expense_member_association',
+        sa.Column('amount_share', sa.Float(), nullable=False, server_default='0')
+    )
+
+    # Rellenar la familia y la parte de cada miembro de los gastos existentes
+    op.execute("""
+        UPDATE expense_member_association AS a
+        SET family_id = e.family_id,
+            amount_share = e.amount / s.members
+        FROM expenses AS e,
+             (SELECT expense_id, COUNT(*) AS members
+              FROM expense_member_association
+              GROUP BY expense_id) AS s
+        WHERE e.id = a.expense_id AND s.expense_id = a.expense_id
+    """)
+
+    # Eliminar asociaciones duplicadas antes de crear la clave primaria
+    op.execute("""
+        DELETE FROM expense_member_association AS a
+        USING expense_member_association AS b
+        WHERE a.ctid < b.ctid
+          AND a.expense_id = b.expense_id
+          AND a.member_id = b.member_id
+    """)
+
+    op.create_foreign_key(
+        'expense_member_association_family_id_fkey',
+        'expense_member_association', 'families', ['family_id'], ['id']
+    )
+    op.create_primary_key(
+        'expense_member_association_pkey',
+        'expense_member_association', ['expense_id', 'member_id']
+    )
+    op.create_index(
+        'ix_expense_member_association_member_id_expense_id',
+        'expense_member_association', ['member_id', 'expense_id']
+    )
+    op.create_index(
+        'ix_expense_member_association_family_id_member_id',
+        'expense_member_association', ['family_id', 'member_id']
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_expense_member_association_family_id_member_id', 'expense_member_association')
+    op.drop_index('ix_expense_member_association_member_id_expense_id', 'expense_member_association')
+    op.drop_constraint('expense_member_association_pkey', 'expense_member_association', type_='primary')
+    op.drop_constraint('expense_member_association_family_id_fkey', 'expense_member_association', type_='foreignkey')
+    op.drop_column('expense_member_association', 'amount_share')
+    op.drop_column('expense_member_association', 'family_id')
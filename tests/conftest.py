@@ -15,6 +15,7 @@ from sqlalchemy.pool import StaticPool
 from app.main import app
 from app.models.database import Base, get_db
 from app.models.models import Family, Member, Expense, Payment
+from app.services.member_service import MemberService
 
 # Añadir el directorio raíz al PATH para que las importaciones funcionen
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -34,6 +35,9 @@ def test_db():
     # Crear las tablas en la base de datos de prueba
     Base.metadata.create_all(bind=engine)
     
+    # Las cachés de miembros son globales: vaciarlas para que no sobrevivan entre pruebas
+    MemberService.invalidate_cached_member()
+    
     # Crear una sesión de prueba
     db = TestingSessionLocal()
     
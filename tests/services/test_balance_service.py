@@ -1,5 +1,7 @@
 import pytest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
+from pydantic import ValidationError
+from app.models.schemas import CreditDetail, MemberBalance
 from app.services.balance_service import BalanceService
 from .test_base import TestBase
 
@@ -303,6 +305,43 @@ class TestBalanceService(TestBase):
         assert result.debts[0].to == "Juan Pérez"
         assert result.debts[0].amount == 50.0
     
+    def test_get_cached_balances(self, mock_db):
+        """
+        Prueba que los balances se reutilizan mientras la versión de la familia
+        no cambia y se recalculan cuando cambia.
+        """
+        balances_v1 = [MagicMock()]
+        balances_v2 = [MagicMock()]
+        
+        with patch.object(
+            BalanceService, "calculate_family_balances", side_effect=[balances_v1, balances_v2]
+        ) as mock_calculate:
+            # La primera llamada calcula los balances; la segunda los toma de la caché
+            assert BalanceService.get_cached_balances(mock_db, "family-uuid-cache", "v1") is balances_v1
+            assert BalanceService.get_cached_balances(mock_db, "family-uuid-cache", "v1") is balances_v1
+            assert mock_calculate.call_count == 1
+            
+            # Una nueva versión de la familia vuelve a calcularlos
+            assert BalanceService.get_cached_balances(mock_db, "family-uuid-cache", "v2") is balances_v2
+            assert mock_calculate.call_count == 2
+    
+    def test_member_balance_is_frozen(self):
+        """
+        Prueba que los balances no se pueden modificar, ya que la caché los
+        comparte entre peticiones.
+        """
+        balance = MemberBalance(
+            member_id="member-uuid-1", name="Juan Pérez",
+            total_debt=0.0, total_owed=50.0, net_balance=50.0,
+            credits=[CreditDetail(from_id="member-uuid-2", from_name="María López", amount=50.0)]
+        )
+        
+        assert balance.debts == []
+        with pytest.raises(ValidationError):
+            balance.net_balance = 0.0
+        with pytest.raises(ValidationError):
+            balance.credits[0].amount = 0.0
+    
     def test_complex_balance_with_three_members(self, mock_db):
         """
         Prueba compleja del cálculo de saldos con 3 miembros, múltiples gastos y pagos.
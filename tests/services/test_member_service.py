@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 from app.services.member_service import MemberService
 from app.models.schemas import MemberCreate, MemberUpdate
 from .test_base import TestBase
@@ -75,13 +75,14 @@ class TestMemberService(TestBase):
         )
         
         # Configurar el mock para devolver el miembro
-        self.setup_mock_query(mock_db, single_result=mock_member)
+        mock_db.execute.return_value.scalar_one_or_none.return_value = mock_member
         
         # Ejecutar el método a probar
         result = MemberService.get_member_by_telegram_id(mock_db, "123456789")
         
-        # Verificar que se realizó la consulta correcta
-        mock_db.query.assert_called_once()
+        # Verificar que se ejecutó la consulta precompilada con el telegram_id
+        mock_db.execute.assert_called_once()
+        assert mock_db.execute.call_args[0][1] == {"telegram_id": "123456789"}
         
         # Verificar que el resultado es el esperado
         assert result == mock_member
@@ -159,4 +160,117 @@ class TestMemberService(TestBase):
         mock_db.query.assert_called_once()
         
         # Verificar que el resultado es None
-        assert result is None 
\ No newline at end of file
+        assert result is None     
+    @pytest.mark.parametrize("families, expected", [
+        (("family-uuid-1", "family-uuid-1"), True),
+        (("family-uuid-1", "family-uuid-2"), False),
+        ((None, "family-uuid-1"), None),
+        (("family-uuid-1", None), None),
+    ])
+    def test_verify_same_family(self, mock_db, families, expected):
+        """
+        Prueba que verify_same_family compara las familias obtenidas en una sola consulta.
+        """
+        # Configurar el mock para devolver la familia del solicitante y la del otro miembro
+        mock_db.execute.return_value.one.return_value = families
+        
+        # Ejecutar el método a probar
+        result = MemberService.verify_same_family(mock_db, "123456789", "member-uuid-1")
+        
+        # Verificar que se ejecutó una única consulta con ambos parámetros
+        mock_db.execute.assert_called_once()
+        assert mock_db.execute.call_args[0][1] == {"telegram_id": "123456789", "member_id": "member-uuid-1"}
+        
+        # Verificar que el resultado es el esperado
+        assert result is expected
+    
+    @pytest.mark.parametrize("family_id", ["family-uuid-1", None])
+    def test_get_family_id(self, mock_db, family_id):
+        """
+        Prueba que get_family_id consulta solo la familia del miembro.
+        """
+        # Configurar el mock para devolver la familia del miembro (o None si no existe)
+        mock_db.execute.return_value.scalar_one_or_none.return_value = family_id
+        
+        # Ejecutar el método a probar
+        result = MemberService.get_family_id(mock_db, "member-uuid-1")
+        
+        # Verificar que se ejecutó una única consulta con el ID del miembro
+        mock_db.execute.assert_called_once()
+        assert mock_db.execute.call_args[0][1] == {"member_id": "member-uuid-1"}
+        
+        # Verificar que el resultado es el esperado
+        assert result == family_id
+    
+    @pytest.mark.parametrize("families, expected", [
+        (("family-uuid-1", "family-uuid-1", "family-uuid-1"), True),
+        (("family-uuid-1", "family-uuid-1", "family-uuid-2"), False),
+        (("family-uuid-2", "family-uuid-1", "family-uuid-1"), False),
+        ((None, None, None), False),
+        (("family-uuid-1", "family-uuid-1", None), False),
+    ])
+    def test_verify_payment_family(self, mock_db, families, expected):
+        """
+        Prueba que verify_payment_family compara las tres familias obtenidas en una sola consulta.
+        """
+        # Configurar el mock para devolver las familias del solicitante, el emisor y el receptor
+        mock_db.execute.return_value.one.return_value = families
+        
+        # Ejecutar el método a probar
+        result = MemberService.verify_payment_family(mock_db, "123456789", "member-uuid-1", "member-uuid-2")
+        
+        # Verificar que se ejecutó una única consulta con los tres parámetros
+        mock_db.execute.assert_called_once()
+        assert mock_db.execute.call_args[0][1] == {
+            "telegram_id": "123456789",
+            "from_member_id": "member-uuid-1",
+            "to_member_id": "member-uuid-2"
+        }
+        
+        # Verificar que el resultado es el esperado
+        assert result is expected
+    
+    def test_get_member_family_id_is_cached(self, mock_db):
+        """
+        Prueba que get_member_family_id solo consulta la base de datos la primera vez
+        y vuelve a consultarla tras invalidar la caché.
+        """
+        MemberService.invalidate_cached_member()
+        mock_db.execute.return_value.scalar_one_or_none.return_value = "family-uuid-1"
+        
+        # Dos llamadas con el mismo telegram_id ejecutan una sola consulta
+        assert MemberService.get_member_family_id(mock_db, "123456789") == "family-uuid-1"
+        assert MemberService.get_member_family_id(mock_db, "123456789") == "family-uuid-1"
+        mock_db.execute.assert_called_once()
+        
+        # Tras invalidar el miembro se vuelve a consultar
+        MemberService.invalidate_cached_member("123456789")
+        assert MemberService.get_member_family_id(mock_db, "123456789") == "family-uuid-1"
+        assert mock_db.execute.call_count == 2
+        MemberService.invalidate_cached_member()
+    
+    def test_delete_member_invalidates_cache_after_commit(self, mock_db):
+        """
+        Prueba que tras eliminar un miembro su familia no queda en la caché, aunque
+        una petición concurrente la vuelva a guardar antes del commit.
+        """
+        MemberService.invalidate_cached_member()
+        member = self.create_mock_member(
+            id="member-uuid-1",
+            telegram_id="123456789",
+            family_id="family-uuid-1"
+        )
+        mock_db.execute.return_value.scalar_one_or_none.return_value = "family-uuid-1"
+        
+        def concurrent_lookup_then_commit():
+            # Una petición concurrente consulta la familia antes de que termine el commit
+            MemberService.get_member_family_id(mock_db, "123456789")
+            mock_db.execute.return_value.scalar_one_or_none.return_value = None
+        
+        mock_db.commit.side_effect = concurrent_lookup_then_commit
+        
+        with patch.object(MemberService, "get_member", return_value=member):
+            assert MemberService.delete_member(mock_db, "member-uuid-1") is member
+        
+        assert MemberService.get_member_family_id(mock_db, "123456789") is None
+        MemberService.invalidate_cached_member()
@@ -1,6 +1,15 @@
+import asyncio
 import pytest
-from fastapi import status
+from unittest.mock import patch
+from fastapi import HTTPException, Request, status
+import jwt
+from jwt.exceptions import PyJWTError
 from app.models.models import Member, Family
+from datetime import timedelta
+from app.auth.auth import create_access_token, get_current_member, authenticate_member, oauth2_scheme, _decode_cached, SECRET_KEY, ALGORITHM
+from app.services.member_service import MemberService
+from app.services.family_service import FamilyService
+from app.models.schemas import MemberCreate
 
 def test_create_access_token(client, test_db):
     # Crear una familia de prueba
@@ -33,6 +42,25 @@ def test_create_access_token(client, test_db):
     assert "access_token" in data
     assert data["token_type"] == "bearer"
     
+def test_create_access_token_from_json(client, test_db):
+    # Crear una familia y un miembro de prueba
+    family = Family(name="Familia de Prueba")
+    test_db.add(family)
+    test_db.commit()
+    member = Member(name="Usuario de Prueba", telegram_id="987654321", family_id=family.id)
+    test_db.add(member)
+    test_db.commit()
+    
+    # El endpoint JSON devuelve el mismo token que el formulario OAuth2
+    response = client.post("/auth/token_json", json={"telegram_id": "987654321"})
+    assert response.status_code == status.HTTP_200_OK
+    form_response = client.post("/auth/token", data={"username": "987654321", "password": ""})
+    assert response.json() == form_response.json()
+    
+    # Un telegram_id inexistente se rechaza igual que en /auth/token
+    response = client.post("/auth/token_json", json={"telegram_id": "id_no_existente"})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
 def test_invalid_authentication(client):
     # Intentar autenticar con un telegram_id que no existe
     response = client.post(
@@ -41,4 +69,118 @@ def test_invalid_authentication(client):
     )
     
     # Verificar que la respuesta sea un error de autenticación
-    assert response.status_code == status.HTTP_401_UNAUTHORIZED 
\ No newline at end of file
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED 
+
+def test_access_token_is_standard_jwt():
+    # El token firmado manualmente debe ser un JWT válido para PyJWT
+    token = create_access_token(data={"sub": "123456789"})
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    
+    assert payload["sub"] == "123456789"
+    assert isinstance(payload["exp"], int)
+    assert jwt.get_unverified_header(token) == {"alg": ALGORITHM, "typ": "JWT"}
+
+def test_decoded_token_is_cached():
+    # Decodificar un token válido por primera vez
+    token = create_access_token(data={"sub": "123456789"})
+    assert _decode_cached(token) == "123456789"
+    
+    # Las siguientes verificaciones no deben volver a decodificar el token
+    with patch("app.auth.auth._verify_token") as mock_verify:
+        assert _decode_cached(token) == "123456789"
+        mock_verify.assert_not_called()
+
+def test_invalid_token_is_not_cached():
+    # Un token inválido debe fallar siempre
+    with pytest.raises(PyJWTError):
+        _decode_cached("token-invalido")
+    with pytest.raises(PyJWTError):
+        _decode_cached("token-invalido")
+
+def test_tampered_token_is_rejected():
+    # Modificar la firma de un token válido
+    token = create_access_token(data={"sub": "123456789"})
+    header, payload, signature = token.split(".")
+    tampered = f"{header}.{payload}.{signature[::-1]}"
+    
+    with pytest.raises(jwt.InvalidSignatureError):
+        _decode_cached(tampered)
+
+def test_expired_token_is_rejected():
+    # Un token con fecha de expiración en el pasado no debe ser aceptado
+    token = create_access_token(data={"sub": "123456789"}, expires_delta=timedelta(minutes=-1))
+    
+    with pytest.raises(jwt.ExpiredSignatureError):
+        _decode_cached(token)
+
+def test_current_member_id_is_cached(test_db):
+    # Crear una familia y un miembro de prueba
+    family = Family(name="Familia de Prueba")
+    test_db.add(family)
+    test_db.commit()
+    member = Member(name="Usuario de Prueba", telegram_id="555555", family_id=family.id)
+    test_db.add(member)
+    test_db.commit()
+    MemberService.invalidate_cached_member()
+    
+    token = create_access_token(data={"sub": member.telegram_id})
+    
+    # La primera resolución guarda el ID del miembro en la caché
+    assert asyncio.run(get_current_member(token, test_db)).id == member.id
+    assert MemberService.get_cached_member_id("555555") == member.id
+    
+    # La segunda resolución devuelve el mismo miembro usando la caché
+    assert asyncio.run(get_current_member(token, test_db)).id == member.id
+    
+    # Eliminar el miembro invalida la entrada de la caché
+    MemberService.delete_member(test_db, member.id)
+    assert MemberService.get_cached_member_id("555555") is None
+
+def test_login_uses_cached_member_id(client, test_db):
+    # Crear una familia y un miembro de prueba
+    family = Family(name="Familia de Prueba")
+    test_db.add(family)
+    test_db.commit()
+    member = Member(name="Usuario de Prueba", telegram_id="666666", family_id=family.id)
+    test_db.add(member)
+    test_db.commit()
+    
+    # El primer inicio de sesión consulta la base de datos y guarda el ID del miembro
+    response = client.post("/auth/token", data={"username": "666666", "password": ""})
+    assert response.status_code == status.HTTP_200_OK
+    assert MemberService.get_cached_member_id("666666") == member.id
+    
+    # Los siguientes inicios de sesión no vuelven a buscar al miembro
+    with patch("app.routers.auth.authenticate_member") as lookup:
+        response = client.post("/auth/token", data={"username": "666666", "password": ""})
+    assert response.status_code == status.HTTP_200_OK
+    lookup.assert_not_called()
+
+def test_unknown_telegram_id_is_cached(test_db):
+    MemberService.invalidate_cached_member()
+    
+    # Un telegram_id inexistente se guarda en la caché negativa
+    assert authenticate_member("777777", test_db) is None
+    assert MemberService.is_unknown_telegram_id("777777")
+    
+    # Añadir el miembro a una familia elimina el telegram_id de la caché negativa
+    family = Family(name="Familia de Prueba")
+    test_db.add(family)
+    test_db.commit()
+    FamilyService.add_member_to_family(test_db, family.id, MemberCreate(name="Nuevo", telegram_id="777777"))
+    assert not MemberService.is_unknown_telegram_id("777777")
+    assert authenticate_member("777777", test_db).telegram_id == "777777"
+
+def test_bearer_scheme_extracts_token():
+    def make_request(authorization):
+        headers = [(b"authorization", authorization.encode())] if authorization else []
+        return Request({"type": "http", "headers": headers})
+    
+    # Un encabezado Bearer válido devuelve el token
+    assert asyncio.run(oauth2_scheme(make_request("Bearer abc.def.ghi"))) == "abc.def.ghi"
+    
+    # Un encabezado ausente o con otro esquema devuelve 401
+    for authorization in (None, "Basic abc"):
+        with pytest.raises(HTTPException) as exc_info:
+            asyncio.run(oauth2_scheme(make_request(authorization)))
+        assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
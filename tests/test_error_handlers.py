@@ -0,0 +1,100 @@
+import pytest
+from fastapi import FastAPI, HTTPException, status
+from fastapi.testclient import TestClient
+from app.test_middleware import app as middleware_app
+import orjson
+from app.middlewares.http_exception_handler import (
+    http_exception_handler,
+    encode_error_response,
+    format_error_response,
+    _encoded_error,
+    MAX_CACHED_DETAIL_LENGTH
+)
+
+
+@pytest.fixture
+def error_client():
+    return TestClient(middleware_app, raise_server_exceptions=False)
+
+
+def test_http_exception_response_format(error_client):
+    response = error_client.get("/http-error")
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == {
+        "error": {
+            "message": "This is a test HTTP error",
+            "type": "http_error",
+            "status_code": 404
+        }
+    }
+
+
+def test_http_exception_body_is_memoized(error_client):
+    _encoded_error.cache_clear()
+
+    first = error_client.get("/http-error")
+    second = error_client.get("/http-error")
+
+    # El cuerpo codificado se reutiliza en la segunda llamada
+    assert first.content == second.content
+    assert _encoded_error.cache_info().hits == 1
+
+
+def test_http_exception_long_detail_is_not_memoized():
+    app = FastAPI()
+    app.add_exception_handler(HTTPException, http_exception_handler)
+    long_detail = "x" * (MAX_CACHED_DETAIL_LENGTH + 1)
+
+    @app.get("/long")
+    def long_error():
+        raise HTTPException(status_code=400, detail=long_detail)
+
+    _encoded_error.cache_clear()
+    response = TestClient(app).get("/long")
+
+    assert response.status_code == 400
+    assert response.json()["error"]["message"] == long_detail
+    assert _encoded_error.cache_info().currsize == 0
+
+
+def test_middleware_database_error(error_client):
+    response = error_client.get("/database-error")
+
+    assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+    assert response.json()["error"]["type"] == "database_error"
+
+
+def test_middleware_value_error(error_client):
+    response = error_client.get("/value-error")
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["error"] == {
+        "message": "This is a test value error",
+        "type": "value_error",
+        "status_code": 400
+    }
+
+
+def test_middleware_unexpected_error(error_client):
+    response = error_client.get("/unexpected-error")
+
+    assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+    assert response.json()["error"]["type"] == "internal_server_error"
+    assert response.headers["content-length"] == str(len(response.content))
+
+
+@pytest.mark.parametrize("message, error_type, status_code", [
+    ("Not Found", "http_error", 404),
+    ('Comillas "escapadas" y acentos: ñ', "value_error", 400),
+    ("Database error occurred", "database_error", 500),
+    ("Tipo desconocido", "custom_error", 418),
+    ("Código no estándar", "http_error", 499),
+    ({"detail": "no es un string"}, "http_error", 400),
+])
+def test_encode_error_response_matches_generic_encoding(message, error_type, status_code):
+    # El camino rápido debe producir exactamente los mismos bytes que el genérico
+    expected = orjson.dumps(format_error_response(message, error_type, status_code))
+
+    assert encode_error_response(message, error_type, status_code) == expected
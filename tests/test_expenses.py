@@ -1,6 +1,6 @@
 import pytest
 from fastapi import status
-from app.models.models import Family, Member, Expense
+from app.models.models import Family, Member, Expense, ExpenseShare
 from app.auth.auth import create_access_token
 
 def test_create_expense(client, test_db):
@@ -157,4 +157,142 @@ def test_get_family_expenses(client, test_db):
     data = response.json()
     assert len(data) == 2
     assert data[0]["description"] == "Gasto 1"
-    assert data[1]["description"] == "Gasto 2" 
\ No newline at end of file
+    assert data[1]["description"] == "Gasto 2"
+
+
+def test_expense_shares_add_up_to_amount(client, test_db):
+    # Crear una familia de prueba con tres miembros
+    family = Family(name="Familia de Prueba")
+    test_db.add(family)
+    test_db.commit()
+    test_db.refresh(family)
+    
+    members = [
+        Member(name=f"Usuario {i}", telegram_id=f"33333{i}", family_id=family.id)
+        for i in range(3)
+    ]
+    test_db.add_all(members)
+    test_db.commit()
+    
+    access_token = create_access_token(
+        data={"sub": members[0].telegram_id}
+    )
+    
+    # 100 no se divide exactamente entre tres miembros
+    response = client.post(
+        "/expenses/",
+        json={
+            "description": "Cena",
+            "amount": 100,
+            "paid_by": members[0].id,
+            "split_among": [m.id for m in members]
+        },
+        headers={"Authorization": f"Bearer {access_token}"}
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    
+    # Las partes se reparten en céntimos y suman exactamente el importe
+    shares = sorted(
+        share.amount_share
+        for share in test_db.query(ExpenseShare).filter(ExpenseShare.expense_id == response.json()["id"])
+    )
+    assert shares == [33.33, 33.33, 33.34]
+
+
+def test_create_expense_rejects_members_outside_family(client, test_db):
+    # Crear dos familias con un miembro cada una
+    family = Family(name="Familia de Prueba")
+    other_family = Family(name="Otra Familia")
+    test_db.add_all([family, other_family])
+    test_db.commit()
+    
+    member = Member(name="Usuario 1", telegram_id="444441", family_id=family.id)
+    outsider = Member(name="Usuario 2", telegram_id="444442", family_id=other_family.id)
+    test_db.add_all([member, outsider])
+    test_db.commit()
+    
+    access_token = create_access_token(
+        data={"sub": member.telegram_id}
+    )
+    
+    # Ni los miembros de otra familia ni los inexistentes pueden compartir el gasto
+    for split_among in ([member.id, outsider.id], [member.id, "00000000-0000-0000-0000-000000000000"]):
+        response = client.post(
+            "/expenses/",
+            json={
+                "description": "Cena",
+                "amount": 100,
+                "paid_by": member.id,
+                "split_among": split_among
+            },
+            headers={"Authorization": f"Bearer {access_token}"}
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+    
+    test_db.rollback()
+    assert test_db.query(Expense).count() == 0
+
+
+def test_malformed_ids_are_rejected(client, test_db):
+    family = Family(name="Familia de Prueba")
+    test_db.add(family)
+    test_db.commit()
+    
+    member = Member(name="Usuario 1", telegram_id="555551", family_id=family.id)
+    test_db.add(member)
+    test_db.commit()
+    
+    access_token = create_access_token(
+        data={"sub": member.telegram_id}
+    )
+    headers = {"Authorization": f"Bearer {access_token}"}
+    
+    # Un id que no es un UUID se rechaza antes de consultar la base de datos
+    response = client.get("/expenses/id_no_existente", headers=headers)
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    
+    response = client.post(
+        "/expenses/",
+        json={
+            "description": "Cena",
+            "amount": 100,
+            "paid_by": member.id,
+            "split_among": [member.id, "id_no_existente"]
+        },
+        headers=headers
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    
+    test_db.rollback()
+    assert test_db.query(Expense).count() == 0
+
+
+def test_create_expense_accepts_uuid_variants(client, test_db):
+    family = Family(name="Familia de Prueba")
+    test_db.add(family)
+    test_db.commit()
+    
+    members = [
+        Member(name="Usuario 1", telegram_id="666661", family_id=family.id),
+        Member(name="Usuario 2", telegram_id="666662", family_id=family.id)
+    ]
+    test_db.add_all(members)
+    test_db.commit()
+    
+    access_token = create_access_token(
+        data={"sub": members[0].telegram_id}
+    )
+    
+    # Un UUID en mayúsculas o sin guiones identifica al mismo miembro
+    response = client.post(
+        "/expenses/",
+        json={
+            "description": "Cena",
+            "amount": 100,
+            "paid_by": members[0].id.upper(),
+            "split_among": [members[0].id.upper(), members[1].id.replace("-", "")]
+        },
+        headers={"Authorization": f"Bearer {access_token}"}
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    assert sorted(m["id"] for m in response.json()["split_among"]) == sorted(m.id for m in members)
@@ -105,4 +105,108 @@ def test_get_family_members(client, test_db):
     data = response.json()
     assert len(data) == 2
     assert data[0]["name"] == "Usuario 1"
-    assert data[1]["name"] == "Usuario 2" 
\ No newline at end of file
+    assert data[1]["name"] == "Usuario 2" 
+
+def test_get_family_members_not_modified(client, test_db):
+    # Crear una familia de prueba con un miembro
+    family = Family(name="Familia de Prueba")
+    test_db.add(family)
+    test_db.commit()
+    test_db.refresh(family)
+    
+    member = Member(
+        name="Usuario de Prueba",
+        telegram_id="333333",
+        family_id=family.id
+    )
+    test_db.add(member)
+    test_db.commit()
+    
+    access_token = create_access_token(
+        data={"sub": member.telegram_id}
+    )
+    headers = {"Authorization": f"Bearer {access_token}"}
+    
+    # La primera respuesta incluye el ETag
+    response = client.get(f"/families/{family.id}/members", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    etag = response.headers["ETag"]
+    
+    # Con el mismo ETag en If-None-Match la respuesta es 304 sin cuerpo
+    response = client.get(
+        f"/families/{family.id}/members",
+        headers={**headers, "If-None-Match": etag}
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+    
+    # Modificar un miembro cambia el ETag (la sesión se cierra tras cada petición)
+    db_member = test_db.get(Member, member.id)
+    db_member.name = "Usuario Renombrado"
+    test_db.commit()
+    
+    response = client.get(
+        f"/families/{family.id}/members",
+        headers={**headers, "If-None-Match": etag}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["ETag"] != etag
+    assert response.json()[0]["name"] == "Usuario Renombrado"
+
+
+def test_get_family_balances_debug_ignores_etag(client, test_db):
+    # Crear una familia de prueba con un miembro
+    family = Family(name="Familia de Prueba")
+    test_db.add(family)
+    test_db.commit()
+    test_db.refresh(family)
+    
+    member = Member(
+        name="Usuario de Prueba",
+        telegram_id="444444",
+        family_id=family.id
+    )
+    test_db.add(member)
+    test_db.commit()
+    
+    access_token = create_access_token(
+        data={"sub": member.telegram_id}
+    )
+    headers = {"Authorization": f"Bearer {access_token}"}
+    
+    response = client.get(f"/families/{family.id}/balances", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    etag = response.headers["ETag"]
+    
+    # Sin debug, el mismo ETag da 304; con debug los balances se recalculan
+    response = client.get(
+        f"/families/{family.id}/balances",
+        headers={**headers, "If-None-Match": etag}
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    
+    response = client.get(
+        f"/families/{family.id}/balances",
+        params={"debug": True},
+        headers={**headers, "If-None-Match": etag}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()[0]["member_id"] == member.id
+
+
+def test_missing_family_with_if_none_match_star(client, test_db):
+    # "*" solo coincide si existe una representación actual de la familia
+    missing_family_id = "00000000-0000-0000-0000-000000000000"
+    headers = {"If-None-Match": "*"}
+    
+    response = client.get(f"/families/{missing_family_id}", headers=headers)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    
+    response = client.get(f"/families/{missing_family_id}/balances", headers=headers)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    
+    response = client.get(f"/families/{missing_family_id}/members", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == []
+    assert "ETag" not in response.headers